@@ -0,0 +1,360 @@
+""" Code example from Complexity and Computation, a book about
+exploring complexity science with Python.  Available free from
+
+http://greenteapress.com/complexity
+
+Copyright 2011 Allen B. Downey.
+Distributed under the GNU General Public License at gnu.org/licenses/gpl.html.
+"""
+import numpy as np
+from itertools import chain, islice
+
+from Graph import Vertex, Edge, Graph, GraphMixin
+
+
+class ArrayGraph(GraphMixin):
+    """An ArrayGraph is an undirected graph whose vertices are the
+    integers 0 .. n-1 and whose adjacency is stored in compressed
+    sparse row (CSR) form: the neighbors of vertex v are
+
+        neighbors[offsets[v]:offsets[v+1]]
+
+    in increasing order.  Every edge is stored in both directions.
+
+    The public surface matches Graph (vertices, out_vertices,
+    get_edge, add_edge, ...), so the generators and the connectivity
+    test in GraphMixin run on an ArrayGraph too.  Vertices and edges
+    added or removed one at a time are buffered and merged into the
+    arrays the next time the adjacency is read, so building a graph
+    vertex by vertex or edge by edge is not quadratic.
+    """
+
+    def __init__(self, n=0, es=[], labels=None):
+        """Creates a new graph.
+        n: number of vertices;
+        es: sequence of pairs of vertex ids;
+        labels: optional list with one label per vertex, which is
+        copied.
+
+        Raises ValueError if there is not one label per vertex.
+        """
+        if labels is not None and len(labels) != n:
+            raise ValueError('%d labels for %d vertices'
+                             % (len(labels), n))
+        self.offsets = np.zeros(n + 1, dtype=np.int64)
+        self.neighbors = np.zeros(0, dtype=index_dtype(n))
+        self.labels = list(labels) if labels is not None else None
+        self._new_vertices = 0
+        self._added = set()
+        self._removed = set()
+        self.add_edges_from(es)
+
+    def __len__(self):
+        return len(self.offsets) - 1 + self._new_vertices
+
+    def __iter__(self):
+        return iter(xrange(len(self)))
+
+    def __contains__(self, v):
+        return 0 <= v < len(self)
+
+    def __repr__(self):
+        return 'ArrayGraph(%d, %d edges)' % (len(self), self.num_edges())
+
+    __str__ = __repr__
+    """The str and repr forms of this object are the same."""
+
+    def add_vertex(self, label=None):
+        """Adds a new vertex to the graph and returns its id."""
+        v = len(self)
+        self._new_vertices += 1
+        if self.labels is not None:
+            # labels from from_csr may be a read-only sequence, like
+            # the LabelTable of a mapped file; copy them on first change
+            if not isinstance(self.labels, list):
+                self.labels = list(self.labels)
+            self.labels.append(label)
+        return v
+
+    def add_edge(self, e):
+        """Adds an edge to the graph.
+
+        e is any pair of vertex ids, for example an Edge.  Adding an
+        edge that is already present has no effect.
+
+        Raises ValueError if either id is not a vertex of the graph.
+        """
+        key = edge_key(*e)
+        if key[0] < 0 or key[1] >= len(self):
+            raise ValueError('edge %s has a vertex not in 0 .. %d'
+                             % (repr(e), len(self) - 1))
+        self._removed.discard(key)
+        if not self._has_array_edge(*key):
+            self._added.add(key)
+
+    def add_edge_array(self, a):
+        """Adds all edges in an (m, 2) array of vertex ids at once.
+
+        Raises ValueError if any id is not a vertex of the graph.
+        """
+        a = np.asarray(a, dtype=np.int64).reshape(-1, 2)
+        if len(a) and (a.min() < 0 or a.max() >= len(self)):
+            raise ValueError('edge array has a vertex not in 0 .. %d'
+                             % (len(self) - 1))
+        self._flush()
+        us = np.concatenate([self._row_ids(), a[:, 0], a[:, 1]])
+        ws = np.concatenate([self.neighbors, a[:, 1], a[:, 0]])
+        self._build(us, ws)
+
+    def add_edges_from(self, es, batch=65536):
+        """Adds all edges from an iterable of pairs of vertex ids.
+
+        The pairs are packed into arrays (batch) at a time and merged
+        into the CSR arrays once at the end."""
+        es = iter(es)
+        chunks = []
+        while True:
+            flat = np.fromiter(chain.from_iterable(islice(es, batch)),
+                               dtype=np.int64)
+            if len(flat) == 0:
+                break
+            chunks.append(flat.reshape(-1, 2))
+        if chunks:
+            self.add_edge_array(np.concatenate(chunks))
+
+    @staticmethod
+    def from_edge_array(a, n=None, labels=None):
+        """Makes an ArrayGraph from an (m, 2) array of vertex ids.
+
+        n: number of vertices; by default one more than the largest id.
+        """
+        a = np.asarray(a)
+        if n is None:
+            n = int(a.max()) + 1 if len(a) else 0
+        g = ArrayGraph(n, labels=labels)
+        g.add_edge_array(a)
+        return g
+
+    def intern_edge(self, v, w):
+        """Returns an Edge connecting v and w.  Edges are not stored
+        as objects, so this is just Edge(v, w)."""
+        return Edge(v, w)
+
+    def get_edge(self, v, w):
+        """Takes two vertices and returns possible edge
+        between them. If no edge present return None."""
+        key = edge_key(v, w)
+        if key in self._removed:
+            return None
+        if key in self._added or self._has_array_edge(v, w):
+            return Edge(v, w)
+        return None
+
+    def remove_edge(self, e):
+        """Removes the edge from the graph.
+
+        Raises KeyError if the edge is not present, like Graph."""
+        key = edge_key(*e)
+        if key in self._added:
+            self._added.remove(key)
+        elif key not in self._removed and self._has_array_edge(*key):
+            self._removed.add(key)
+        else:
+            raise KeyError(e)
+
+    def vertices(self):
+        """Return list of vertices in the graph."""
+        return range(len(self))
+
+    def edges(self):
+        """Return list of edges in the graph, one per direction
+        grouped by vertex, as Graph.edges does."""
+        return [self.out_edges(v) for v in self]
+
+    def num_edges(self):
+        """Returns the number of undirected edges."""
+        self._flush()
+        loops = np.count_nonzero(self._row_ids() == self.neighbors)
+        return (len(self.neighbors) - loops) / 2 + loops
+
+    def out_vertices(self, v):
+        """Takes a vertex and returns list of adjacent
+        vertices."""
+        return self.neighbor_array(v).tolist()
+
+    def out_edges(self, v):
+        """Takes a vertex and returns outgoing edges."""
+        return [Edge(v, w) for w in self.neighbor_array(v).tolist()]
+
+    def neighbor_array(self, v):
+        """Returns the neighbors of v as a slice of the CSR array."""
+        self._flush()
+        return self.neighbors[self.offsets[v]:self.offsets[v + 1]]
+
+    def csr(self):
+        """Returns the arrays (offsets, neighbors) with any buffered
+        changes merged in."""
+        self._flush()
+        return self.offsets, self.neighbors
+
+    def degrees(self):
+        """Returns an array with the degree of every vertex."""
+        self._flush()
+        return np.diff(self.offsets)
+
+    def edge_array(self):
+        """Returns an (m, 2) array with one row (v, w), v <= w,
+        for each undirected edge."""
+        self._flush()
+        us = self._row_ids()
+        keep = us <= self.neighbors
+        return np.column_stack([us[keep], self.neighbors[keep]])
+
+    def add_all_edges(self):
+        """Assuming a previously edgless graph, add
+        all edges to make it a complete graph."""
+        n = len(self)
+        us, ws = np.triu_indices(n, 1)
+        self.add_edge_array(np.column_stack([us, ws]))
+
+    def copy(self):
+        """Returns a copy of this graph that shares no arrays with it."""
+        self._flush()
+        labels = list(self.labels) if self.labels is not None else None
+        return ArrayGraph.from_csr(self.offsets.copy(),
+                                   self.neighbors.copy(), labels)
+
+    @staticmethod
+    def from_csr(offsets, neighbors, labels=None):
+        """Makes an ArrayGraph that uses the given CSR arrays and
+        labels directly, without copying them; they may be read-only,
+        for example memory-mapped.  Each row of neighbors must be
+        sorted and every edge must appear in both directions."""
+        g = ArrayGraph(0)
+        g.offsets = offsets
+        g.neighbors = neighbors
+        g.labels = labels
+        return g
+
+    @staticmethod
+    def from_graph(g):
+        """Makes an ArrayGraph from a dict-of-dicts Graph.
+
+        Vertex ids follow the order of g.vertices(); the original
+        Vertex objects are kept as labels so to_graph can restore them.
+        """
+        vs = list(g.vertices())
+        index = dict((v, i) for i, v in enumerate(vs))
+        pairs = [(index[v], index[w]) for v in vs for w in g.out_vertices(v)]
+        ag = ArrayGraph(len(vs), labels=vs)
+        if pairs:
+            a = np.array(pairs, dtype=np.int64)
+            ag._build(a[:, 0], a[:, 1])
+        return ag
+
+    def to_graph(self, graph_class=Graph):
+        """Makes a dict-of-dicts Graph with the same structure.
+
+        If this graph has labels that are Vertex objects they are
+        reused; otherwise a new Vertex is made for each id.
+        """
+        if self.labels is not None:
+            vs = [v if isinstance(v, Vertex) else Vertex(v)
+                  for v in self.labels]
+        else:
+            vs = [Vertex(i) for i in self]
+        g = graph_class(vs)
+        for v, w in self.edge_array().tolist():
+            g.add_edge(Edge(vs[v], vs[w]))
+        return g
+
+    def _row_ids(self):
+        """Returns the source vertex of every entry in neighbors."""
+        return np.repeat(np.arange(len(self)), np.diff(self.offsets))
+
+    def _has_array_edge(self, v, w):
+        """Looks up w in the (sorted) CSR row of v."""
+        if v >= len(self.offsets) - 1:
+            # a buffered vertex, which has no row yet
+            return False
+        lo, hi = self.offsets[v], self.offsets[v + 1]
+        i = lo + np.searchsorted(self.neighbors[lo:hi], w)
+        return i < hi and self.neighbors[i] == w
+
+    def _flush(self):
+        """Merges the buffered additions and removals into the arrays."""
+        if self._new_vertices:
+            # the new vertices have empty rows
+            tail = np.empty(self._new_vertices, dtype=self.offsets.dtype)
+            tail.fill(self.offsets[-1])
+            self.offsets = np.concatenate([self.offsets, tail])
+            if self.neighbors.dtype != index_dtype(len(self)):
+                self.neighbors = self.neighbors.astype(index_dtype(len(self)))
+            self._new_vertices = 0
+        if not self._added and not self._removed:
+            return
+        us = self._row_ids()
+        ws = self.neighbors
+        if self._removed:
+            dead = np.array(sorted(self._removed), dtype=np.int64)
+            n = len(self)
+            keys = np.minimum(us, ws) * n + np.maximum(us, ws)
+            keep = ~np.in1d(keys, dead[:, 0] * n + dead[:, 1])
+            us, ws = us[keep], ws[keep]
+        if self._added:
+            new = np.array(list(self._added), dtype=np.int64)
+            us = np.concatenate([us, new[:, 0], new[:, 1]])
+            ws = np.concatenate([ws, new[:, 1], new[:, 0]])
+        self._added = set()
+        self._removed = set()
+        self._build(us, ws)
+
+    def _build(self, us, ws):
+        """Rebuilds offsets and neighbors from parallel arrays of
+        directed entries, dropping duplicates."""
+        n = len(self)
+        keys = np.unique(np.asarray(us, dtype=np.int64) * n + ws)
+        counts = np.bincount(keys // n, minlength=n) if n else []
+        self.offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+        self.neighbors = (keys % n).astype(index_dtype(n)) if n else \
+            np.zeros(0, dtype=index_dtype(n))
+
+
+def edge_key(v, w):
+    """Returns the undirected pair (v, w) in canonical order."""
+    if v <= w:
+        return (v, w)
+    return (w, v)
+
+
+def index_dtype(n):
+    """Returns the smallest integer dtype that can hold ids < n."""
+    if n < 2**31:
+        return np.int32
+    return np.int64
+
+
+def main(script, n='10', *args):
+    n = int(n)
+    g = ArrayGraph(n)
+    g.add_regular_edges(4)
+    print g
+    print 'out_vertices for 0:', g.out_vertices(0)
+    print 'get_edge(0, 1):', g.get_edge(0, 1)
+    print 'connected:', g.is_connected()
+
+    # the generators are shared with Graph through GraphMixin
+    h = ArrayGraph(n)
+    h.add_random_edges(0.3)
+    print h, h.edge_array().tolist()
+    print 'rewire:', g.rewire(0.2, rng=1), g.is_connected()
+
+    # round trip through the dict-of-dicts representation
+    dg = h.to_graph()
+    print len(dg), ArrayGraph.from_graph(dg)
+
+
+if __name__ == '__main__':
+    import sys
+    main(*sys.argv)
@@ -0,0 +1,155 @@
+""" Code example from Complexity and Computation, a book about
+exploring complexity science with Python.  Available free from
+
+http://greenteapress.com/complexity
+
+Copyright 2011 Allen B. Downey.
+Distributed under the GNU General Public License at gnu.org/licenses/gpl.html.
+
+Storing benchmark results and drawing figures from them.
+
+A result file is JSON with the options for one figure and a list of
+series, each with a label and the lists ns and ts:
+
+    {"title": "...", "scale": "log", "exp": null,
+     "series": [{"label": "sum_plus", "ns": [...], "ts": [...]}, ...]}
+
+listsum.collect and Map.collect run the benchmarks and write result
+files; render_all draws any number of them in parallel worker
+processes.  Figures are drawn with the Agg backend through a Figure
+object rather than pyplot, so nothing needs a display and nothing
+waits for a window to close, and a figure can be redrawn without
+running its benchmarks again.
+"""
+import json
+import multiprocessing
+import os
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from Complexity import fit, fit_complexity, check_regression
+
+COLORS = ['blue', 'orange', 'green', 'red', 'purple']
+
+
+def save_results(filename, series, title='', scale='log', exp=None,
+                 xlabel='n', ylabel='run time (s)'):
+    """Writes a result file.
+
+    series: list of (label, ns, ts)
+    exp: expected exponent, or None to draw the best-fitting model
+    """
+    results = dict(title=title, scale=scale, exp=exp, xlabel=xlabel,
+                   ylabel=ylabel,
+                   series=[dict(label=label, ns=list(ns), ts=list(ts))
+                           for label, ns, ts in series])
+    with open(filename, 'w') as fp:
+        json.dump(results, fp, indent=1)
+
+
+def load_results(filename):
+    """Reads a result file and returns the dictionary."""
+    with open(filename) as fp:
+        return json.load(fp)
+
+
+def draw(ax, ns, ts, label, color='blue', exp=None):
+    """Draws one series and its fitted curve on Axes ax, like
+    listsum.plot.
+
+    Returns the ComplexityFit and whether the series grows faster
+    than exp."""
+    if exp is None:
+        regressed, result = False, fit_complexity(ns, ts)
+        tfit = result.predict(ns)
+    else:
+        regressed, result = check_regression(ns, ts, exp)
+        tfit = fit(ns, ts, exp)
+    ax.plot(ns, tfit, color='0.7', linewidth=2, linestyle='dashed')
+    ax.plot(ns, ts, label=label, color=color, linewidth=3)
+    return result, regressed
+
+
+def output_names(filename, formats):
+    """Returns the names of the figures for a result file."""
+    root = os.path.splitext(filename)[0]
+    return ['%s.%s' % (root, ext) for ext in formats]
+
+
+def render(filename, formats=('png',), force=False):
+    """Draws the figure for a result file and saves it in the given
+    formats, next to the result file.
+
+    Figures that are newer than their result file are not redrawn,
+    unless force is True.
+
+    Returns a list of lines that report the fit of each series.
+    """
+    outputs = output_names(filename, formats)
+    mtime = os.path.getmtime(filename)
+    if not force and all(os.path.exists(out) and
+                         os.path.getmtime(out) >= mtime
+                         for out in outputs):
+        return ['%s: up to date' % filename]
+
+    results = load_results(filename)
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    ax.set_xscale(results['scale'])
+    ax.set_yscale(results['scale'])
+    ax.set_title(results['title'])
+    ax.set_xlabel(results['xlabel'])
+    ax.set_ylabel(results['ylabel'])
+
+    report = []
+    exp = results['exp']
+    for series, color in zip(results['series'], COLORS):
+        result, regressed = draw(ax, series['ns'], series['ts'],
+                                 series['label'], color, exp)
+        line = '%s: %s %s' % (filename, series['label'], result)
+        if regressed:
+            line += '  REGRESSION (expected n**%g)' % exp
+        report.append(line)
+    ax.legend(loc=4)
+
+    for out in outputs:
+        fig.savefig(out)
+    return report
+
+
+def _render(args):
+    return render(*args)
+
+
+def render_all(filenames, formats=('png',), force=False, processes=None):
+    """Renders the result files, split across a process pool.
+
+    processes: number of worker processes; None uses all CPUs.
+
+    Returns the report lines of all the figures.
+    """
+    tasks = [(filename, formats, force) for filename in filenames]
+    if processes == 1 or len(tasks) < 2:
+        reports = map(_render, tasks)
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            reports = pool.map(_render, tasks)
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+    return [line for report in reports for line in report]
+
+
+def main(script, *filenames):
+    """Renders the given result files as PNG, PDF and EPS."""
+    for line in render_all(filenames, formats=('png', 'pdf', 'eps')):
+        print line
+
+
+if __name__ == '__main__':
+    import sys
+    main(*sys.argv)
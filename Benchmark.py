@@ -0,0 +1,160 @@
+""" Code example from Complexity and Computation, a book about
+exploring complexity science with Python.  Available free from
+
+http://greenteapress.com/complexity
+
+Copyright 2011 Allen B. Downey.
+Distributed under the GNU General Public License at gnu.org/licenses/gpl.html.
+
+A harness for timing small pieces of code.
+
+Timing one call with a coarse clock, like os.times, mostly measures
+the clock.  measure instead uses the highest-resolution clock there
+is, repeats the call until each sample is long enough to time
+accurately, runs it a few times first to warm up, turns off the
+garbage collector while timing, and takes several samples, so the
+result comes with a measure of its spread.
+"""
+import gc
+import math
+import time
+from timeit import default_timer
+
+import numpy as np
+
+
+if hasattr(time, 'perf_counter_ns'):
+    clock_ns = time.perf_counter_ns
+else:
+    def clock_ns():
+        """Returns the time in integer nanoseconds from
+        timeit.default_timer, for Pythons without perf_counter_ns."""
+        return int(default_timer() * 1e9)
+
+
+class Timing(object):
+    """The result of measure: the time per call in seconds for each
+    of several samples, and the number of calls in each sample."""
+
+    def __init__(self, samples, number=1):
+        self.samples = np.sort(np.asarray(samples, dtype=float))
+        self.number = number
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __str__(self):
+        low, high = self.ci()
+        return ('median %s (95%% CI %s to %s), IQR %s, min %s, '
+                '%d x %d calls' % (
+                    format_time(self.median()), format_time(low),
+                    format_time(high), format_time(self.iqr()),
+                    format_time(self.min()), len(self), self.number))
+
+    def median(self):
+        return np.median(self.samples)
+
+    def min(self):
+        return self.samples[0]
+
+    def mean(self):
+        return self.samples.mean()
+
+    def iqr(self):
+        """Interquartile range: the spread of the middle half of
+        the samples."""
+        q1, q3 = np.percentile(self.samples, [25, 75])
+        return q3 - q1
+
+    def ci(self, z=1.96):
+        """Returns (low, high), a confidence interval for the median
+        (about 95% for z=1.96).
+
+        The bounds are order statistics, so the interval does not
+        depend on the shape of the distribution, which for run times
+        is usually skewed.  With few samples it is just the range.
+        """
+        k = len(self.samples)
+        half = z * math.sqrt(k) / 2.0
+        lo = max(int(math.floor(k / 2.0 - half)), 0)
+        hi = min(int(math.ceil(k / 2.0 + half)), k - 1)
+        return self.samples[lo], self.samples[hi]
+
+
+def format_time(t):
+    """Formats a time in seconds with a suitable unit."""
+    for unit, scale in [('s', 1), ('ms', 1e3), ('us', 1e6)]:
+        if t * scale >= 1:
+            return '%.3g %s' % (t * scale, unit)
+    return '%.3g ns' % (t * 1e9)
+
+
+def run(f, args, number):
+    """Calls f(*args) (number) times; returns the elapsed time in
+    nanoseconds."""
+    rng = xrange(number)
+    start = clock_ns()
+    for i in rng:
+        f(*args)
+    return clock_ns() - start
+
+
+def calibrate(f, args=(), min_time=0.01):
+    """Returns the number of calls of f(*args) that take at least
+    min_time seconds, trying 1, 2, 5, 10, 20, 50, ..."""
+    number = 1
+    while True:
+        for step in [1, 2, 5]:
+            if run(f, args, number * step) >= min_time * 1e9:
+                return number * step
+        number *= 10
+
+
+def measure(f, setup=None, repeat=7, number=None, min_time=0.01,
+            warmup=1, disable_gc=True):
+    """Times f and returns a Timing.
+
+    f: function to time
+    setup: function that returns a tuple of arguments for f.  If it
+           is given, it is called before every call of f, outside the
+           timing, so each call gets fresh arguments (a new empty map,
+           for example), and each sample is one call.
+    repeat: number of samples
+    number: calls per sample; if None, as many as take min_time
+    warmup: number of samples to run and discard first
+    disable_gc: whether to turn off the garbage collector while timing
+    """
+    if setup is not None:
+        number = 1
+    elif number is None:
+        number = calibrate(f, (), min_time)
+
+    gc_was_enabled = gc.isenabled()
+    gc.collect()
+    if disable_gc:
+        gc.disable()
+    try:
+        samples = []
+        for i in range(warmup + repeat):
+            args = setup() if setup is not None else ()
+            elapsed = run(f, args, number)
+            if i >= warmup:
+                samples.append(elapsed * 1e-9 / number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return Timing(samples, number)
+
+
+def main(script):
+    t = [[1]] * 10000
+    print 'sum:   ', measure(lambda: sum(t, []))
+    print 'extend:', measure(lambda: [].extend(t))
+
+    items = zip(range(10000), range(10000))
+    print 'dict:  ', measure(dict, setup=lambda: (items,), repeat=21)
+
+
+if __name__ == '__main__':
+    import sys
+    main(*sys.argv)
@@ -0,0 +1,190 @@
+""" Code example from Complexity and Computation, a book about
+exploring complexity science with Python.  Available free from
+
+http://greenteapress.com/complexity
+
+Copyright 2011 Allen B. Downey.
+Distributed under the GNU General Public License at gnu.org/licenses/gpl.html.
+
+Estimating the order of growth of a function from measured run times.
+
+Given problem sizes ns and run times ts, fit_complexity fits a straight
+line to log t versus log n, whose slope estimates the exponent k in
+t ~ c n**k, and compares how well each of O(1), O(log n), O(n),
+O(n log n) and O(n**2) describes the data.  check_regression flags a
+series whose exponent is clearly larger than the expected one.
+"""
+import math
+
+import numpy as np
+
+
+# name and shape of each model, in increasing order of growth
+MODELS = [
+    ('O(1)', lambda n: np.ones_like(n)),
+    ('O(log n)', lambda n: np.log(n)),
+    ('O(n)', lambda n: n),
+    ('O(n log n)', lambda n: n * np.log(n)),
+    ('O(n^2)', lambda n: n**2),
+]
+
+# exponent each model looks like on a log-log plot
+EXPONENTS = {'O(1)': 0.0, 'O(log n)': 0.0, 'O(n)': 1.0,
+             'O(n log n)': 1.0, 'O(n^2)': 2.0}
+
+# two-sided 95% critical values of Student's t for 1 to 30 degrees
+# of freedom; for more, the normal value 1.96 is close enough
+T95 = [12.71, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262,
+       2.228, 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101,
+       2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052,
+       2.048, 2.045, 2.042]
+
+
+def t95(dof):
+    """Returns the 95% critical value of t with dof degrees of
+    freedom."""
+    if dof <= len(T95):
+        return T95[dof - 1]
+    return 1.96
+
+
+def clean(ns, ts):
+    """Returns ns and ts as float arrays, without the points where
+    n or t is not positive, which have no logarithm."""
+    ns = np.asarray(ns, dtype=float)
+    ts = np.asarray(ts, dtype=float)
+    keep = (ns > 1) & (ts > 0)
+    return ns[keep], ts[keep]
+
+
+def fit_exponent(ns, ts):
+    """Fits log t = a + k log n by least squares.
+
+    Returns (k, stderr, (low, high)), where (low, high) is a 95%
+    confidence interval for k.
+    """
+    ns, ts = clean(ns, ts)
+    if len(ns) < 3:
+        raise ValueError('need at least 3 points with n > 1 and t > 0')
+    x = np.log(ns)
+    y = np.log(ts)
+    xbar = x.mean()
+    sxx = ((x - xbar)**2).sum()
+    if sxx == 0:
+        raise ValueError('need at least 2 different values of n')
+    k = ((x - xbar) * (y - y.mean())).sum() / sxx
+    a = y.mean() - k * xbar
+    dof = len(x) - 2
+    resid = y - (a + k * x)
+    stderr = math.sqrt((resid**2).sum() / dof / sxx)
+    half = t95(dof) * stderr
+    return k, stderr, (k - half, k + half)
+
+
+def fit_model(ns, ts, shape):
+    """Fits t = c * shape(n), with the errors measured in log t, so
+    every point counts the same whatever its size.
+
+    Returns (c, rss), where rss is the sum of squared residuals of
+    log t.
+    """
+    ns, ts = clean(ns, ts)
+    logs = np.log(ts) - np.log(shape(ns))
+    log_c = logs.mean()
+    rss = ((logs - log_c)**2).sum()
+    return math.exp(log_c), rss
+
+
+class ComplexityFit(object):
+    """The result of fit_complexity.
+
+    exponent, stderr, ci: the log-log slope, its standard error and
+    95% confidence interval
+    model: name of the model that fits best
+    scale: constant factor of the best model
+    rss: map from model name to its sum of squared residuals
+    """
+
+    def __init__(self, ns, ts):
+        self.exponent, self.stderr, self.ci = fit_exponent(ns, ts)
+        self.rss = {}
+        self.scales = {}
+        for name, shape in MODELS:
+            self.scales[name], self.rss[name] = fit_model(ns, ts, shape)
+
+        # all models have one parameter, so the smallest residual
+        # wins; ties go to the slower-growing model
+        self.model = min(MODELS, key=lambda m: self.rss[m[0]])[0]
+        self.scale = self.scales[self.model]
+
+    def __str__(self):
+        low, high = self.ci
+        return '%s, exponent %.2f (95%% CI %.2f to %.2f)' % (
+            self.model, self.exponent, low, high)
+
+    def predict(self, ns, model=None):
+        """Returns the run times the fitted model predicts for ns.
+
+        model: name of the model to use; by default the best one.
+        """
+        model = model or self.model
+        shape = dict(MODELS)[model]
+        return self.scales[model] * shape(np.asarray(ns, dtype=float))
+
+
+def fit_complexity(ns, ts):
+    """Fits the run times ts for problem sizes ns; returns a
+    ComplexityFit."""
+    return ComplexityFit(ns, ts)
+
+
+def check_regression(ns, ts, expected, tolerance=0.1):
+    """Checks whether run times grow faster than expected.
+
+    expected: an exponent, or the name of a model in MODELS
+    tolerance: how much larger than expected the exponent may be
+
+    Returns (regressed, fit), where regressed is True if the whole
+    confidence interval of the exponent is more than tolerance above
+    the expected exponent, so noise alone does not raise the flag.
+    """
+    if isinstance(expected, basestring):
+        expected = EXPONENTS[expected]
+    result = fit_complexity(ns, ts)
+    regressed = result.ci[0] > expected + tolerance
+    return regressed, result
+
+
+def fit(ns, ts, exp=1.0, index=-1):
+    """Fits a curve with the given exponent.
+
+    Use the given index as a reference point, and scale all other
+    points accordingly.  This is the reference curve that listsum.plot
+    and BenchPlot.draw draw when an expected exponent is given.
+    """
+    nref = ns[index]
+    tref = ts[index]
+
+    tfit = []
+    for n in ns:
+        ratio = float(n) / nref
+        t = ratio**exp * tref
+        tfit.append(t)
+
+    return tfit
+
+
+def main(script):
+    random_state = np.random.RandomState(17)
+    ns = np.logspace(3, 6, 20)
+    noise = np.exp(random_state.normal(0, 0.1, len(ns)))
+    for name, shape in MODELS:
+        ts = 1e-8 * shape(ns) * noise
+        regressed, fit = check_regression(ns, ts, 'O(n)')
+        print '%-12s %s%s' % (name, fit,
+                              '  REGRESSION' if regressed else '')
+
+
+if __name__ == '__main__':
+    import sys
+    main(*sys.argv)
@@ -0,0 +1,277 @@
+""" Code example from Complexity and Computation, a book about
+exploring complexity science with Python.  Available free from
+
+http://greenteapress.com/complexity
+
+Copyright 2011 Allen B. Downey.
+Distributed under the GNU General Public License at gnu.org/licenses/gpl.html.
+
+Monte Carlo estimate of the probability that a G(n, p) random graph
+is connected, over a grid of n and p.  Each (n, p) cell is one task;
+tasks run in a process pool and their results are appended to a CSV
+or JSON-lines file as soon as they finish, so an interrupted sweep
+can be resumed by running it again with the same file.
+"""
+import csv
+import json
+import math
+import os
+import multiprocessing
+
+import numpy as np
+
+from ArrayGraph import ArrayGraph
+from RandomGraph import gnp_edge_array
+from UnionFind import DisjointSet
+from RandomStreams import derive_seed, numpy_rng
+
+FIELDS = ['n', 'p', 'trials', 'connected', 'fraction', 'ci_low', 'ci_high']
+
+
+def task_seed(seed, n, p):
+    """Derives the seed for cell (n, p) from the sweep seed.
+
+    The seed depends only on the cell, not on which worker runs it
+    or when, so results do not depend on the number of processes."""
+    return derive_seed(seed, n, p)
+
+
+def wilson_interval(successes, trials, z=1.96):
+    """Returns the Wilson score interval (low, high) for a binomial
+    proportion; z=1.96 gives a 95% interval.  The bounds are clamped
+    to [0, 1], since rounding can push them just outside."""
+    if trials == 0:
+        return 0.0, 1.0
+    phat = float(successes) / trials
+    denom = 1 + z**2 / trials
+    center = phat + z**2 / (2 * trials)
+    margin = z * math.sqrt(phat * (1 - phat) / trials +
+                           z**2 / (4.0 * trials**2))
+    low = (center - margin) / denom
+    high = (center + margin) / denom
+    return max(low, 0.0), min(high, 1.0)
+
+
+def run_cell(task):
+    """Runs all trials for one (n, p) cell and returns a result dict.
+
+    task: tuple of (n, p, trials, seed)
+    """
+    n, p, trials, seed = task
+    random_state = np.random.RandomState(seed)
+    connected = 0
+    for i in range(trials):
+        g = ArrayGraph(n)
+        g.add_edge_array(gnp_edge_array(n, p, random_state))
+        connected += g.is_connected()
+
+    return make_record(n, p, trials, connected)
+
+
+def make_record(n, p, trials, connected):
+    """Returns the result dict for one (n, p) cell."""
+    low, high = wilson_interval(connected, trials)
+    return dict(n=n, p=p, trials=trials, connected=connected,
+                fraction=float(connected) / trials,
+                ci_low=low, ci_high=high)
+
+
+def connectivity_threshold(n, p_max=1.0, random_state=None):
+    """Returns the smallest p at which one random graph becomes
+    connected, or None if it is not connected at p_max.
+
+    Every pair of vertices gets a uniform random weight, and the
+    G(n, p) graph is the set of pairs with weight <= p.  Feeding the
+    edges to a DisjointSet in order of weight finds the threshold in
+    one pass, which answers "is it connected at p" for every p.
+
+    Edges are generated in bands of doubling p: the pairs with weight
+    in (a, b] are a G(n, (b-a)/(1-a)) sample of the pairs not seen in
+    earlier bands, so only about as many edges as the threshold needs
+    are ever drawn.
+    """
+    random_state = numpy_rng(random_state)
+    if n < 2:
+        return 0.0
+
+    ds = DisjointSet(n)
+    seen = np.zeros(0, dtype=np.int64)
+    a = 0.0
+    b = min(p_max, np.log(n) / n)
+    while a < p_max:
+        q = (b - a) / (1 - a)
+        es = gnp_edge_array(n, q, random_state)
+        keys = es[:, 0] * n + es[:, 1]
+        fresh = ~np.in1d(keys, seen)
+        es, keys = es[fresh], keys[fresh]
+        weights = random_state.uniform(a, b, size=len(es))
+        order = np.argsort(weights)
+
+        union = ds.union
+        for (v, w), weight in zip(es[order].tolist(),
+                                  weights[order].tolist()):
+            if union(v, w) and ds.count == 1:
+                return weight
+
+        seen = np.union1d(seen, keys)
+        a, b = b, min(p_max, 2 * b)
+    return None
+
+
+def run_row(task):
+    """Runs all trials for one n and returns a list of result dicts,
+    one for each p, using connectivity_threshold.
+
+    task: tuple of (n, ps, trials, seed)
+    """
+    n, ps, trials, seed = task
+    random_state = np.random.RandomState(seed)
+    p_max = max(ps)
+    thresholds = []
+    for i in range(trials):
+        t = connectivity_threshold(n, p_max, random_state)
+        if t is not None:
+            thresholds.append(t)
+
+    thresholds.sort()
+    counts = np.searchsorted(thresholds, ps, side='right')
+    return [make_record(n, p, trials, int(c)) for p, c in zip(ps, counts)]
+
+
+class ResultFile(object):
+    """Appends sweep results to a file, one record per line.
+
+    Files ending in .csv are written as CSV with a header;
+    anything else is written as JSON lines.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.is_csv = filename.endswith('.csv')
+
+    def read(self):
+        """Returns the list of records already in the file.
+
+        A record that was cut off when the sweep was interrupted
+        is skipped, so its cell runs again."""
+        if not os.path.exists(self.filename):
+            return []
+        records = []
+        with open(self.filename) as fp:
+            rows = csv.DictReader(fp) if self.is_csv else fp
+            for row in rows:
+                try:
+                    records.append(self.parse(row))
+                except (ValueError, TypeError, KeyError):
+                    pass
+        return records
+
+    def parse(self, row):
+        """Converts one line (or CSV row) into a record."""
+        if not self.is_csv:
+            return json.loads(row)
+        record = dict(n=int(row['n']), p=float(row['p']),
+                      trials=int(row['trials']),
+                      connected=int(row['connected']))
+        for k in FIELDS[4:]:
+            record[k] = float(row[k])
+        return record
+
+    def done(self):
+        """Returns the set of (n, p) cells already in the file."""
+        return set((r['n'], r['p']) for r in self.read())
+
+    def open(self):
+        """Opens the file for appending and writes a CSV header if
+        the file is new."""
+        new = not os.path.exists(self.filename) or \
+            os.path.getsize(self.filename) == 0
+        self.fp = open(self.filename, 'a+')
+        if not new:
+            # finish a line that was cut off by an interruption
+            self.fp.seek(-1, os.SEEK_END)
+            if self.fp.read(1) != '\n':
+                self.fp.write('\n')
+        if self.is_csv:
+            self.writer = csv.DictWriter(self.fp, FIELDS)
+            if new:
+                self.writer.writeheader()
+
+    def write(self, record):
+        """Appends one record and flushes it to disk."""
+        if self.is_csv:
+            self.writer.writerow(dict((k, repr(record[k])) for k in FIELDS))
+        else:
+            self.fp.write(json.dumps(record, sort_keys=True) + '\n')
+        self.fp.flush()
+
+    def close(self):
+        self.fp.close()
+
+
+def sweep(ns, ps, trials, filename, seed=0, processes=None,
+          method='threshold'):
+    """Estimates the fraction of connected G(n, p) graphs for every
+    n in ns and p in ps.
+
+    method: 'threshold' finds each trial's connectivity threshold with
+    a DisjointSet and answers all of ps at once (see run_row);
+    'graph' builds and tests a separate graph for every p (see run_cell).
+
+    Results are appended to filename as they complete; cells that
+    are already in the file are skipped, which resumes an interrupted
+    sweep.  Yields each new result dict.
+
+    processes: size of the process pool; None uses all CPUs and 1
+    runs the tasks in this process.
+    """
+    out = ResultFile(filename)
+    done = out.done()
+    if method == 'threshold':
+        func = run_row
+        tasks = []
+        for n in ns:
+            todo = [p for p in ps if (n, p) not in done]
+            if todo:
+                tasks.append((n, todo, trials, task_seed(seed, n, None)))
+    elif method == 'graph':
+        func = run_cell
+        tasks = [(n, p, trials, task_seed(seed, n, p))
+                 for n in ns for p in ps if (n, p) not in done]
+    else:
+        raise ValueError, 'Unknown sweep method: %r' % method
+    if not tasks:
+        return
+
+    out.open()
+    pool = None
+    try:
+        if processes == 1:
+            results = (func(task) for task in tasks)
+        else:
+            pool = multiprocessing.Pool(processes)
+            results = pool.imap_unordered(func, tasks)
+        for result in results:
+            records = result if method == 'threshold' else [result]
+            for record in records:
+                out.write(record)
+                yield record
+        if pool is not None:
+            pool.close()
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        out.close()
+
+
+def main(script, filename='connectivity.jsonl', trials='100', *args):
+    ns = range(10, 110, 10)
+    ps = [i / 100.0 for i in range(1, 100)]
+    for r in sweep(ns, ps, int(trials), filename):
+        print 'N: %(n)s\t\tp: %(p)s\t\t pct connected: %(fraction)s' % r
+
+
+if __name__ == '__main__':
+    import sys
+    main(*sys.argv)
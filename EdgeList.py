@@ -0,0 +1,197 @@
+""" Code example from Complexity and Computation, a book about
+exploring complexity science with Python.  Available free from
+
+http://greenteapress.com/complexity
+
+Copyright 2011 Allen B. Downey.
+Distributed under the GNU General Public License at gnu.org/licenses/gpl.html.
+
+Reading and writing graphs as edge lists: text files with one edge
+per line, given as two whitespace-separated vertex labels, like the
+datasets from SNAP (http://snap.stanford.edu/data).  Lines starting
+with # or % are comments, and columns after the second are ignored.
+Files whose names end in .gz are compressed with gzip.
+"""
+import gzip
+import io
+import time
+from itertools import islice
+
+import numpy as np
+
+from Graph import Vertex
+from ArrayGraph import ArrayGraph
+from GraphFile import label_bytes
+
+
+def open_text(filename, mode='r', compresslevel=6):
+    """Opens filename, through gzip if it ends with .gz.
+
+    compresslevel: gzip level used when writing; the gzip default of 9
+    is several times slower to write and barely smaller.
+
+    When reading, the gzip file is wrapped in a BufferedReader, which
+    makes iterating over its lines several times faster."""
+    if filename.endswith('.gz'):
+        fp = gzip.open(filename, mode + 'b', compresslevel)
+        if mode == 'r':
+            fp = io.BufferedReader(fp, 1 << 20)
+        return fp
+    return open(filename, mode)
+
+
+def iter_pairs(lines, comments='#%'):
+    """Generates (label, label) pairs from lines of an edge list."""
+    for line in lines:
+        t = line.split(None, 2)
+        if len(t) < 2 or t[0][0] in comments:
+            continue
+        yield t[0], t[1]
+
+
+def read_edgelist(filename, graph_class=ArrayGraph, chunk_size=65536,
+                  stats=None, verbose=False):
+    """Reads an edge list and returns a graph.
+
+    The file is read in chunks of (chunk_size) edges.  Each label is
+    mapped to a compact integer id the first time it is seen, and the
+    ids are packed into arrays as the file is read, so the text is
+    never held in memory.
+
+    graph_class: ArrayGraph (the default), whose labels are the
+    strings from the file, decoded from UTF-8, or Graph or a subclass
+    with a from_edge_array method, which gets one Vertex per label.
+    stats: if a dict is given, it gets the number of edges and
+    vertices, the elapsed time in seconds and the edges per second.
+    verbose: print the progress after each chunk.
+    """
+    start = time.time()
+    ids = {}
+    setdefault = ids.setdefault
+    chunks = []
+    m = 0
+
+    with open_text(filename) as fp:
+        pairs = iter_pairs(fp)
+        while True:
+            chunk = list(islice(pairs, chunk_size))
+            if not chunk:
+                break
+            flat = [setdefault(label, len(ids))
+                    for pair in chunk for label in pair]
+            chunks.append(np.array(flat, dtype=np.int64).reshape(-1, 2))
+            m += len(chunk)
+            if verbose:
+                elapsed = time.time() - start
+                print '%d edges, %d vertices, %.0f edges/s' % (
+                    m, len(ids), m / elapsed)
+
+    n = len(ids)
+    labels = [None] * n
+    for label, i in ids.iteritems():
+        labels[i] = label.decode('utf-8')
+    del ids
+
+    a = np.concatenate(chunks) if chunks else \
+        np.zeros((0, 2), dtype=np.int64)
+    if issubclass(graph_class, ArrayGraph):
+        g = graph_class.from_edge_array(a, n, labels=labels)
+    else:
+        g = graph_class.from_edge_array(a, [Vertex(l) for l in labels])
+
+    elapsed = time.time() - start
+    if stats is not None:
+        stats.update(edges=m, vertices=n, seconds=elapsed,
+                     edges_per_second=m / elapsed if elapsed else 0.0)
+    if verbose:
+        print 'read %d edges in %.2f s (%.0f edges/s)' % (
+            m, elapsed, m / elapsed if elapsed else 0.0)
+    return g
+
+
+def iter_edges(g, chunk_size=65536, convert=None):
+    """Generates the undirected edges of g as pairs of labels.
+
+    For an ArrayGraph the labels are the vertex labels if it has
+    them, otherwise the vertex ids; for a Graph they are the labels
+    of the Vertices.
+
+    convert: if given, a function applied to each label, such as
+    label_bytes; for an ArrayGraph it is called once per vertex
+    rather than once per edge.
+    """
+    if isinstance(g, ArrayGraph):
+        a = g.edge_array()
+        labels = g.labels
+        if labels is not None and convert is not None:
+            labels = map(convert, labels)
+        for start in xrange(0, len(a), chunk_size):
+            rows = a[start:start + chunk_size].tolist()
+            if labels is None:
+                for v, w in rows:
+                    yield v, w
+            else:
+                for v, w in rows:
+                    yield labels[v], labels[w]
+    else:
+        seen = set()
+        for v in g:
+            for w, e in g[v].iteritems():
+                if id(e) not in seen:
+                    seen.add(id(e))
+                    if convert is None:
+                        yield v.label, w.label
+                    else:
+                        yield convert(v.label), convert(w.label)
+
+
+def write_edgelist(g, filename, chunk_size=65536, header=True,
+                   stats=None):
+    """Writes the edges of Graph or ArrayGraph g to filename, one per
+    line, in chunks of (chunk_size) lines.
+
+    Labels must not contain whitespace.  Unicode labels are encoded
+    as UTF-8, as in GraphFile.
+    stats: if a dict is given, it gets the number of edges written,
+    the elapsed time and the edges per second.
+    """
+    start = time.time()
+    m = 0
+    edges = iter_edges(g, chunk_size, label_bytes)
+    with open_text(filename, 'w') as fp:
+        if header:
+            fp.write('# %d vertices\n' % len(g))
+        while True:
+            chunk = list(islice(edges, chunk_size))
+            if not chunk:
+                break
+            fp.write(''.join('%s\t%s\n' % pair for pair in chunk))
+            m += len(chunk)
+
+    if stats is not None:
+        elapsed = time.time() - start
+        stats.update(edges=m, seconds=elapsed,
+                     edges_per_second=m / elapsed if elapsed else 0.0)
+
+
+def main(script, filename='edges.txt.gz', n='100000', *args):
+    from SmallWorldGraph import ring_lattice_array, rewire_array
+
+    n = int(n)
+    a = rewire_array(ring_lattice_array(n, 10), n, 0.1, 17)
+    g = ArrayGraph.from_edge_array(a, n)
+
+    stats = {}
+    write_edgelist(g, filename, stats=stats)
+    print 'wrote %(edges)d edges in %(seconds).2f s ' \
+          '(%(edges_per_second).0f edges/s)' % stats
+
+    h = read_edgelist(filename, stats=stats)
+    print 'read %(edges)d edges, %(vertices)d vertices in ' \
+          '%(seconds).2f s (%(edges_per_second).0f edges/s)' % stats
+    print h
+
+
+if __name__ == '__main__':
+    import sys
+    main(*sys.argv)
@@ -7,12 +7,21 @@ http://greenteapress.com/complexity
 Copyright 2011 Allen B. Downey.
 Distributed under the GNU General Public License at gnu.org/licenses/gpl.html.
 """
-import random
-from operator import contains
+import math
+import pickle
 from collections import deque
+from itertools import izip
+
+import numpy as np
+
+from RandomStreams import python_rng
 
 class Vertex(object):
-    """A Vertex is a node in a graph."""
+    """A Vertex is a node in a graph.
+
+    Vertices use __slots__ instead of a __dict__, which makes them
+    much smaller; pos and color are the attributes GraphWorld sets."""
+    __slots__ = ['label', 'pos', 'color']
 
     def __init__(self, label=''):
         self.label = label
@@ -25,9 +34,20 @@ class Vertex(object):
     __str__ = __repr__
     """The str and repr forms of this object are the same."""
 
+    def __getstate__(self):
+        """Returns the attributes that are set, so that Vertices can
+        be pickled with any protocol, though they have no __dict__."""
+        return dict((name, getattr(self, name)) for name in self.__slots__
+                    if hasattr(self, name))
+
+    def __setstate__(self, state):
+        for name, value in state.iteritems():
+            setattr(self, name, value)
+
 
 class Edge(tuple):
     """An Edge is a list of two vertices."""
+    __slots__ = []
 
     def __new__(cls, *vs):
         """The Edge constructor takes two vertices."""
@@ -43,96 +63,29 @@ class Edge(tuple):
     __str__ = __repr__
     """The str and repr forms of this object are the same."""
 
+    def __reduce__(self):
+        """Pickles an Edge as a call to the constructor."""
+        return Edge, tuple(self)
 
-class Graph(dict):
-    """A Graph is a dictionary of dictionaries.  The outer
-    dictionary maps from a vertex to an inner dictionary.
-    The inner dictionary maps from other vertices to edges.
-    
-    For vertices a and b, graph[a][b] maps
-    to the edge that connects a->b, if it exists."""
-
-    def __init__(self, vs=[], es=[]):
-        """Creates a new graph.  
-        vs: list of vertices;
-        es: list of edges.
-        """
-        # # old:
-        # for v in vs:
-        #     self.add_vertex(v)
-
-        # for e in es:
-        #     self.add_edge(e)
-
-        # new using list comprehension:
-        [self.add_vertex(v) for v in vs]
-        [self.add_edge(e) for e in es]
-
-    def add_vertex(self, v):
-        """Add a vertex to the graph."""
-        self[v] = {}
-
-    def add_edge(self, e):
-        """Adds and edge to the graph by adding an entry in both directions.
-
-        If there is already an edge connecting these Vertices, the
-        new edge replaces it.
-        """
-        v, w = e
-        self[v][w] = e
-        self[w][v] = e
-
-    def get_edge(self, v, w):
-        """Takes two vertices and returns possible edge
-        between them. If no edge present return None."""
-        try:
-            return self[v][w]
-        except:
-            return None
-
-    def remove_edge(self, e):
-        """Removes all references of the edge from the
-        graph."""
-        v, w = e
-        del self[v][w]
-        del self[w][v]
-
-    def vertices(self):
-        """Return list of vertices in the graph."""
-        return self.keys()
-
-    def edges(self):
-        """Return list of edges in the graph."""
-        # # old:
-        # res = list()
-        # for d in self.values():
-        #     res.append(d.values())
 
-        # new using list comprehension
-        res = [d.values() for d in self.values()]
-        return res
+class GraphMixin(object):
+    """Algorithms shared by Graph and ArrayGraph: the regular, random
+    and small-world generators and the connectivity test.
 
-    def out_vertices(self, v):
-        """Takes a vertex and returns list of adjacent
-        vertices."""
-        return self[v].keys()
+    They only use the public surface (vertices, out_vertices,
+    get_edge, intern_edge, add_edge, add_edges_from, remove_edge), so
+    they run on either representation.
+    """
 
-    def out_edges(self, v):
-        """Takes a vertex and returns outgoing edges."""
-        return self[v].values()
+    class DegreeError(Exception):
+        """Error class for when too many degrees
+        demanded in add_regular_edges."""
 
-    def add_all_edges(self):
-        """Assuming a previously edgless graph, add
-        all edges to make it a complete graph."""
-        # # old:
-        # for v in self.keys():
-        #     for w in self.keys():
-        #         if v != w:
-        #             self.add_edge(Edge(v, w))
+        def __init__(self, value):
+            self.value = value
 
-        # new using list comprehension:
-        [self.add_edge(Edge(v,w)) for v in self.keys() for w in self.keys()
-                if v!=w]
+        def __str__(self):
+            return repr(self.value)
 
     def check_regular_possibility(self, degree):
         """Check given degree number can be used
@@ -177,7 +130,7 @@ class Graph(dict):
         for i, v in enumerate(vs):
             for j in range(1, k / 2 + 1):
                 w = double[i+j]
-                self.add_edge(Edge(v, w))
+                self.add_edge(self.intern_edge(v, w))
 
     def add_regular_edges_odd(self):
         vs = self.vertices()
@@ -187,15 +140,18 @@ class Graph(dict):
         for i in range(n/2):
             v = reduplicated_list[i]
             w = reduplicated_list[i+n/2]
-            self.add_edge(Edge(v, w))
+            self.add_edge(self.intern_edge(v, w))
 
-    def is_connected(self):
+    def is_connected(self, rng=None):
         """Returns True if the Graph is
-        connected of False otherwise."""
+        connected of False otherwise.
+
+        rng: chooses the start vertex; random.Random, int seed or
+        None (see RandomStreams)."""
         q = deque()
         marked = set()
         vs = self.vertices()
-        q.append(random.choice(vs))
+        q.append(python_rng(rng).choice(vs))
         while len(q) > 0:
             # remove a vertex from q
             v = q.pop()
@@ -221,17 +177,317 @@ class Graph(dict):
         else:
             return False
 
+    def add_random_edges(self, p, rng=None):
+        """Erdos-Renyi G(n, p) model.
+        n is given by number of vertices in the graph.
+        Pass p to add edges randomly until there is 
+        a probability of p that there is an edge between
+        any two graphs.
 
-    class DegreeError(Exception):
-        """Error class for when too many degrees
-        demanded in add_regular_edges."""
+        rng: random.Random or int seed for reproducible runs
+        (see RandomStreams); None uses the random module.
 
-        def __init__(self, value):
-            self.value = value
+        Uses geometric skips between edges (see gnp_pairs), so
+        the cost is O(n + m) rather than O(n**2)."""
+        vs = self.vertices()
+        self.add_edges_from((vs[i], vs[j])
+                            for i, j in gnp_pairs(len(vs), p, rng))
+
+    def rewire(self, p, rng=None, k=None):
+        """A method that takes a probability
+        p as a parameter and, starting with a 
+        regular graph, rewires the graph using 
+        Watts and Strogatzs algorithm
+
+        rng: random.Random, int seed or None (see RandomStreams).
+        k: degree of the regular graph; by default the degree of the
+        first vertex.
+        Returns the counts reported by replace."""
+        rng = python_rng(rng)
+        vs = self.vertices()
+        position = dict((v, i) for i, v in enumerate(vs))
+        if k is None:
+            k = len(self.out_vertices(vs[0])) if vs else 0
+
+        # edges are identified by their ends in vertex order, since an
+        # ArrayGraph makes a new Edge each time one is asked for
+        def key(v, w):
+            if position[v] <= position[w]:
+                return v, w
+            return w, v
+
+        original_edges = set(key(v, w) for v in vs
+                             for w in self.out_vertices(v))
+        subset_to_rewire = list()
+        for closeness in range(k):
+            for v in vs:
+                if len(original_edges) < 1:
+                    break
+                # choose neighbour by degree of separation
+                # use sort to make sure that list of 
+                # vertices is ordered. Sorting by position
+                # rather than by object makes the order
+                # the same in every run.
+                w = sorted(self.out_vertices(v), key=position.get)[closeness]
+                if key(v, w) in original_edges:
+                    original_edges.remove(key(v, w))
+                    replace = rng.random() <= p
+                    if replace:
+                        subset_to_rewire.append(self.get_edge(v, w))
+        return self.replace(subset_to_rewire, rng)
+
+    def replace(self, subset, rng=None):
+        """Takes a subset of Edges and replaces them randomly.
+
+        Each Edge (v, w) is replaced by (v, x), where x is drawn by
+        index from the vertex list.  Draws that hit v itself or one of
+        its neighbours (including w) are rejected and drawn again, so
+        the graph stays simple and each replacement takes O(1)
+        expected time.  Edges from a vertex that is already joined to
+        every other vertex are skipped.
+
+        Returns a dict with the number of edges rewired, the number of
+        rejected draws, and the number of edges skipped."""
+        rng = python_rng(rng)
+        uniform = rng.random
+        vs = self.vertices()
+        n = len(vs)
+        rewired = rejected = skipped = 0
+        for e in subset:
+            v = e[0]
+            out = set(self.out_vertices(v))
+            if len(out) >= n - 1:
+                skipped += 1
+                continue
+            while True:
+                x = vs[int(uniform() * n)]
+                if x != v and x not in out:
+                    break
+                rejected += 1
+            self.remove_edge(e)
+            self.add_edge(Edge(v, x))
+            rewired += 1
+        return dict(rewired=rewired, rejected=rejected, skipped=skipped)
+
+
+class Graph(GraphMixin, dict):
+    """A Graph is a dictionary of dictionaries.  The outer
+    dictionary maps from a vertex to an inner dictionary.
+    The inner dictionary maps from other vertices to edges.
+    
+    For vertices a and b, graph[a][b] maps
+    to the edge that connects a->b, if it exists.
+
+    The graph also keeps a list of the vertices in the order they
+    were added, so that vertices() and everything built on it (the
+    regular and random generators) do not depend on the order of the
+    dictionary, which changes from run to run."""
+
+    def __init__(self, vs=[], es=[]):
+        """Creates a new graph.  
+        vs: list of vertices;
+        es: list of edges.
+        """
+        # # old:
+        # for v in vs:
+        #     self.add_vertex(v)
+
+        # for e in es:
+        #     self.add_edge(e)
+
+        # # list comprehension:
+        # [self.add_vertex(v) for v in vs]
+        # [self.add_edge(e) for e in es]
+
+        # new: no throwaway lists, and a bulk path for the edges
+        self.order = []
+        for v in vs:
+            self.add_vertex(v)
+        self.add_edges_from(es)
+
+    def add_vertex(self, v):
+        """Add a vertex to the graph."""
+        if v not in self:
+            self.order.append(v)
+        self[v] = {}
+
+    def add_edge(self, e):
+        """Adds and edge to the graph by adding an entry in both directions.
+
+        If there is already an edge connecting these Vertices, the
+        new edge replaces it.
+        """
+        v, w = e
+        self[v][w] = e
+        self[w][v] = e
+
+    def add_edges_from(self, es):
+        """Adds all edges from an iterable of Edges or pairs of
+        vertices, in one pass with minimal per-edge overhead.
+
+        Pairs that are not Edges are made into Edges.  As in add_edge,
+        a new edge replaces an existing one between the same vertices.
+        """
+        new_edge = tuple.__new__
+        for e in es:
+            v, w = e
+            if not isinstance(e, Edge):
+                e = new_edge(Edge, (v, w))
+            self[v][w] = e
+            self[w][v] = e
+
+    @classmethod
+    def from_edge_array(cls, a, vs=None):
+        """Makes a graph from an (m, 2) NumPy array of vertex indices.
+
+        vs: list of vertices that the indices refer to; by default
+        Vertex(0) .. Vertex(k) where k is the largest index.
+
+        The entries are sorted by vertex so that each inner dictionary
+        is filled by a single update call, rather than two dictionary
+        writes per edge in Python.
+
+        As with add_edges_from, when a pair of vertices appears more
+        than once, in either direction, the last one wins, so there is
+        a single Edge per pair.
+        """
+        a = np.asarray(a, dtype=np.int64).reshape(-1, 2)
+        m = len(a)
+        if vs is None:
+            n = int(a.max()) + 1 if m else 0
+            vs = [Vertex(i) for i in range(n)]
+        g = cls(vs)
+        if m == 0:
+            return g
+
+        # keep the last row for each unordered pair, in their order
+        n = len(vs)
+        keys = a.min(axis=1) * n + a.max(axis=1)
+        last = m - 1 - np.unique(keys[::-1], return_index=True)[1]
+        a = a[np.sort(last)]
+        m = len(a)
+
+        new_edge = tuple.__new__
+        es = [new_edge(Edge, (vs[i], vs[j])) for i, j in a.tolist()]
+
+        # one entry per direction, grouped by source vertex
+        src = np.concatenate([a[:, 0], a[:, 1]])
+        dst = np.concatenate([a[:, 1], a[:, 0]])
+        which = np.tile(np.arange(m), 2)
+        order = np.argsort(src, kind='mergesort')
+        src = src[order]
+        dst = map(vs.__getitem__, dst[order].tolist())
+        which = which[order].tolist()
+
+        bounds = (np.flatnonzero(np.diff(src)) + 1).tolist()
+        starts = [0] + bounds
+        ends = bounds + [2 * m]
+        heads = src[starts].tolist()
+        for v, start, end in izip(heads, starts, ends):
+            g[vs[v]].update(izip(dst[start:end],
+                                 map(es.__getitem__, which[start:end])))
+        return g
+
+    def intern_edge(self, v, w):
+        """Returns the Edge that connects v and w: the one already in
+        the graph if there is one, so each undirected edge is a single
+        object, otherwise a new Edge."""
+        e = self[v].get(w)
+        if e is None:
+            e = Edge(v, w)
+        return e
+
+    def get_edge(self, v, w):
+        """Takes two vertices and returns possible edge
+        between them. If no edge present return None."""
+        try:
+            return self[v][w]
+        except:
+            return None
+
+    def remove_edge(self, e):
+        """Removes all references of the edge from the
+        graph."""
+        v, w = e
+        del self[v][w]
+        del self[w][v]
+
+    def vertices(self):
+        """Return list of vertices in the graph, in the order
+        they were added."""
+        return list(self.order)
+
+    def edges(self):
+        """Return list of edges in the graph."""
+        # # old:
+        # res = list()
+        # for d in self.values():
+        #     res.append(d.values())
+
+        # new using list comprehension
+        res = [d.values() for d in self.values()]
+        return res
+
+    def out_vertices(self, v):
+        """Takes a vertex and returns list of adjacent
+        vertices."""
+        return self[v].keys()
+
+    def out_edges(self, v):
+        """Takes a vertex and returns outgoing edges."""
+        return self[v].values()
+
+    def add_all_edges(self):
+        """Assuming a previously edgless graph, add
+        all edges to make it a complete graph."""
+        # # old:
+        # for v in self.keys():
+        #     for w in self.keys():
+        #         if v != w:
+        #             self.add_edge(Edge(v, w))
+
+        # # list comprehension:
+        # [self.add_edge(Edge(v,w)) for v in self.keys() for w in self.keys()
+        #         if v!=w]
+
+        # new: visit each pair once, so only one Edge is made per
+        # pair, and insert them through the bulk path
+        vs = self.vertices()
+        self.add_edges_from((v, w) for i, v in enumerate(vs)
+                            for w in vs[i+1:])
+
+
+def gnp_pairs(n, p, rng=None):
+    """Generates the edges of a G(n, p) random graph as pairs of
+    vertex indices (i, j) with j < i.
+
+    Instead of drawing a random number for every pair, draws the
+    length of the gap to the next edge from a geometric distribution
+    (Batagelj and Brandes, Efficient generation of large random
+    networks, 2005), so it takes O(n + m) time.
+
+    rng: random.Random, int seed or None (see RandomStreams).
+    """
+    rng = python_rng(rng)
+    if p <= 0 or n < 2:
+        return
+    if p >= 1:
+        for i in xrange(1, n):
+            for j in xrange(i):
+                yield i, j
+        return
+
+    log_q = math.log(1.0 - p)
+    i, j = 1, -1
+    while i < n:
+        r = rng.random()
+        j += 1 + int(math.log(1.0 - r) / log_q)
+        while j >= i and i < n:
+            j -= i
+            i += 1
+        if i < n:
+            yield i, j
 
-        def __str__(self):
-            return repr(self.value)
-            
 
 def is_odd(x):
     return x % 2
@@ -278,6 +534,9 @@ def main(script, *args):
     print 'Add all edges:'
     g.add_all_edges()
     print g.edges() 
+    print 'Pickle and unpickle:'
+    h = pickle.loads(pickle.dumps(g))
+    print h.vertices(), len(h.edges())
 
 
 if __name__ == '__main__':
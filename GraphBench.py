@@ -0,0 +1,194 @@
+""" Code example from Complexity and Computation, a book about
+exploring complexity science with Python.  Available free from
+
+http://greenteapress.com/complexity
+
+Copyright 2011 Allen B. Downey.
+Distributed under the GNU General Public License at gnu.org/licenses/gpl.html.
+
+Benchmarks for the graph representations.
+"""
+import sys
+from itertools import izip
+from timeit import default_timer
+
+import numpy as np
+
+from Graph import Vertex, Edge, Graph
+from RandomGraph import RandomGraph
+from SmallWorldGraph import SmallWorldGraph, ring_lattice_array
+from ArrayGraph import ArrayGraph
+
+
+class DictVertex(object):
+    """The original Vertex, with a __dict__, kept to measure the
+    savings from __slots__."""
+
+    def __init__(self, label=''):
+        self.label = label
+
+
+class DictEdge(tuple):
+    """The original Edge, with a __dict__ slot."""
+
+    def __new__(cls, *vs):
+        return tuple.__new__(cls, vs)
+
+
+def graph_bytes(g):
+    """Returns the number of bytes used by Graph g: the outer and
+    inner dictionaries, the vertices and the (distinct) edges.
+    Labels are not counted."""
+    total = sys.getsizeof(g)
+    seen = set()
+    for v, d in g.iteritems():
+        total += sys.getsizeof(d) + object_bytes(v)
+        for e in d.itervalues():
+            if id(e) not in seen:
+                seen.add(id(e))
+                total += object_bytes(e)
+    return total
+
+
+def array_graph_bytes(g):
+    """Returns the number of bytes in the arrays of ArrayGraph g."""
+    offsets, neighbors = g.csr()
+    return sys.getsizeof(g) + offsets.nbytes + neighbors.nbytes
+
+
+def object_bytes(x):
+    """Size of x, including its __dict__ if it has one."""
+    size = sys.getsizeof(x)
+    d = getattr(x, '__dict__', None)
+    if d is not None:
+        size += sys.getsizeof(d)
+    return size
+
+
+def legacy_copy(g):
+    """Returns a Graph with the same structure as g, made from the
+    original (unslotted) vertex and edge classes."""
+    vs = dict((v, DictVertex(v.label)) for v in g)
+    res = Graph(vs.values())
+    for v in g:
+        for w, e in g[v].iteritems():
+            if w not in res[vs[v]]:
+                res.add_edge(DictEdge(vs[v], vs[w]))
+    return res
+
+
+def count_edges(g):
+    """Number of undirected edges in Graph g."""
+    return len(set(id(e) for d in g.itervalues() for e in d.itervalues()))
+
+
+def per_item(g, measure, empty):
+    """Returns (bytes per vertex, bytes per edge) for graph g.
+
+    empty is a copy of g with no edges; the vertices account for all
+    of its size, and the edges for the rest of g's size."""
+    n = len(g)
+    m = count_edges(g) if isinstance(g, Graph) else g.num_edges()
+    vertex_bytes = measure(empty)
+    edge_bytes = measure(g) - vertex_bytes
+    return float(vertex_bytes) / n, float(edge_bytes) / max(m, 1)
+
+
+def memory_report(name, g):
+    """Prints bytes per vertex and per edge for g in the original
+    representation, the current one, and as an ArrayGraph."""
+    old = legacy_copy(g)
+    rows = [
+        ('before', old, graph_bytes, Graph(old.keys())),
+        ('after', g, graph_bytes, Graph(g.keys())),
+        ('array', ArrayGraph.from_graph(g), array_graph_bytes,
+         ArrayGraph(len(g))),
+    ]
+    for label, h, measure, empty in rows:
+        bv, be = per_item(h, measure, empty)
+        print '%-16s %-7s %8.1f bytes/vertex %8.1f bytes/edge' % (
+            name, label, bv, be)
+
+
+def complete_pairs(n):
+    """Returns the edges of a complete graph as an (m, 2) array."""
+    us, ws = np.triu_indices(n, 1)
+    return np.column_stack([us, ws])
+
+
+def per_edge(a, vs):
+    """The original construction path: one add_edge per Edge."""
+    g = Graph(vs)
+    for i, j in a.tolist():
+        g.add_edge(Edge(vs[i], vs[j]))
+    return g
+
+
+def bulk_iterable(a, vs):
+    """Graph.add_edges_from with an iterator of vertex pairs.
+
+    The pairs are zipped from two lists of vertices, rather than made
+    by a generator expression, which would add a Python frame switch
+    per edge and cost more than add_edges_from saves."""
+    g = Graph(vs)
+    get = vs.__getitem__
+    g.add_edges_from(izip(map(get, a[:, 0].tolist()),
+                          map(get, a[:, 1].tolist())))
+    return g
+
+
+def bulk_array(a, vs):
+    """Graph.from_edge_array."""
+    return Graph.from_edge_array(a, vs)
+
+
+def array_graph(a, vs):
+    """ArrayGraph.from_edge_array."""
+    return ArrayGraph.from_edge_array(a, len(vs))
+
+
+def time_it(f, *args):
+    """Returns the elapsed time of the fastest of three runs of f."""
+    best = None
+    for i in range(3):
+        start = default_timer()
+        f(*args)
+        elapsed = default_timer() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def ingestion_report(name, a):
+    """Prints the time per edge of each construction path for the
+    edges in array a."""
+    n = int(a.max()) + 1
+    vs = [Vertex(i) for i in range(n)]
+    base = None
+    for f in [per_edge, bulk_iterable, bulk_array, array_graph]:
+        t = time_it(f, a, vs)
+        base = base or t
+        print '%-16s %-14s %8.3f us/edge %6.2fx' % (
+            name, f.__name__, 1e6 * t / len(a), base / t)
+
+
+def main(script, n='10000', *args):
+    n = int(n)
+
+    ingestion_report('complete(1000)', complete_pairs(1000))
+    ingestion_report('regular(%d, 10)' % n, ring_lattice_array(n, 10))
+
+    g = Graph([Vertex(i) for i in range(300)])
+    g.add_all_edges()
+    memory_report('Graph', g)
+
+    g = RandomGraph([Vertex(i) for i in range(n)])
+    g.add_random_edges(10.0 / n)
+    memory_report('RandomGraph', g)
+
+    g = SmallWorldGraph(n, 10)
+    memory_report('SmallWorldGraph', g)
+
+
+if __name__ == '__main__':
+    main(*sys.argv)
@@ -0,0 +1,174 @@
+""" Code example from Complexity and Computation, a book about
+exploring complexity science with Python.  Available free from
+
+http://greenteapress.com/complexity
+
+Copyright 2011 Allen B. Downey.
+Distributed under the GNU General Public License at gnu.org/licenses/gpl.html.
+
+A binary file format for graphs that can be memory-mapped.
+
+The file is a 64-byte header followed by arrays, each starting on an
+8-byte boundary:
+
+    offsets         int64[n+1]     CSR row offsets
+    neighbors       int32 or int64 [nnz]
+    label offsets   int64[n+1]     (only if the file has labels)
+    label data      UTF-8 bytes    (only if the file has labels)
+
+The header holds the magic string, the format version, n, nnz, the
+size of a neighbor entry, and the position of the label table (0 if
+there is none); all integers are little-endian.
+
+read_graph maps the arrays with numpy.memmap instead of reading them,
+so opening a file takes the same time whatever its size, and worker
+processes that open the same file share its pages.
+"""
+import struct
+
+import numpy as np
+
+from Graph import Vertex
+from ArrayGraph import ArrayGraph
+
+MAGIC = 'GRAPHCSR'
+VERSION = 1
+HEADER = struct.Struct('<8sIIQQQ24x')
+
+
+class GraphFileError(Exception):
+    """Error class for files that are not in this format."""
+
+
+def align(pos, size=8):
+    """Rounds pos up to a multiple of size."""
+    return (pos + size - 1) // size * size
+
+
+def label_bytes(label):
+    """Encodes a label (or the label of a Vertex) as UTF-8 bytes."""
+    if isinstance(label, Vertex):
+        label = label.label
+    if isinstance(label, unicode):
+        return label.encode('utf-8')
+    return str(label)
+
+
+def write_graph(g, filename, labels=True):
+    """Writes Graph or ArrayGraph g to filename.
+
+    labels: whether to store the vertex labels (as strings).  For an
+    ArrayGraph without labels, nothing is stored.
+    """
+    if not isinstance(g, ArrayGraph):
+        g = ArrayGraph.from_graph(g)
+    offsets, neighbors = g.csr()
+    n = len(g)
+    nnz = len(neighbors)
+    itemsize = neighbors.dtype.itemsize
+    neighbors_at = HEADER.size + 8 * (n + 1)
+    labels_at = align(neighbors_at + itemsize * nnz)
+    has_labels = labels and g.labels is not None
+
+    with open(filename, 'wb') as fp:
+        fp.write(HEADER.pack(MAGIC, VERSION, itemsize, n, nnz,
+                             labels_at if has_labels else 0))
+        offsets.astype('<i8').tofile(fp)
+        neighbors.astype('<i%d' % itemsize).tofile(fp)
+        if not has_labels:
+            return
+
+        fp.write('\0' * (labels_at - fp.tell()))
+        data = [label_bytes(label) for label in g.labels]
+        ends = np.cumsum([len(b) for b in data], dtype='<i8')
+        np.concatenate([[0], ends]).astype('<i8').tofile(fp)
+        for b in data:
+            fp.write(b)
+
+
+def read_header(filename):
+    """Returns (version, itemsize, n, nnz, labels_at) from the header
+    of filename."""
+    with open(filename, 'rb') as fp:
+        raw = fp.read(HEADER.size)
+    if len(raw) < HEADER.size:
+        raise GraphFileError('%s is too short to be a graph file'
+                             % filename)
+    magic, version, itemsize, n, nnz, labels_at = HEADER.unpack(raw)
+    if magic != MAGIC:
+        raise GraphFileError('%s is not a graph file' % filename)
+    if version != VERSION:
+        raise GraphFileError('%s has unsupported version %d'
+                             % (filename, version))
+    return version, itemsize, n, nnz, labels_at
+
+
+def read_graph(filename, mode='r'):
+    """Opens a graph file as an ArrayGraph whose arrays are
+    memory-mapped from the file.
+
+    mode: numpy.memmap mode; the default 'r' maps the file read-only
+    and shares its pages with other processes.  Changing the graph
+    does not change the file; the arrays are replaced by new ones,
+    and adding a vertex copies the labels into a list.
+    """
+    version, itemsize, n, nnz, labels_at = read_header(filename)
+    pos = HEADER.size
+    offsets = np.memmap(filename, '<i8', mode, pos, shape=(n + 1,))
+    pos += 8 * (n + 1)
+    if nnz:
+        neighbors = np.memmap(filename, '<i%d' % itemsize, mode, pos,
+                              shape=(nnz,))
+    else:
+        neighbors = np.zeros(0, dtype='<i%d' % itemsize)
+
+    labels = None
+    if labels_at:
+        labels = LabelTable(filename, labels_at, n, mode)
+    return ArrayGraph.from_csr(offsets, neighbors, labels)
+
+
+class LabelTable(object):
+    """A read-only sequence of labels, decoded from a memory-mapped
+    label table only when they are accessed."""
+
+    def __init__(self, filename, pos, n, mode='r'):
+        self.ends = np.memmap(filename, '<i8', mode, pos, shape=(n + 1,))
+        self.data_at = pos + 8 * (n + 1)
+        size = int(self.ends[-1])
+        if size:
+            self.data = np.memmap(filename, np.uint8, mode, self.data_at,
+                                  shape=(size,))
+        else:
+            self.data = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.ends) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.data[self.ends[i]:self.ends[i+1]].tostring() \
+            .decode('utf-8')
+
+
+def main(script, filename='graph.csr', n='100000', *args):
+    import time
+    from SmallWorldGraph import ring_lattice_array
+
+    n = int(n)
+    g = ArrayGraph.from_edge_array(ring_lattice_array(n, 10), n,
+                                   labels=['v%d' % i for i in range(n)])
+    write_graph(g, filename)
+
+    start = time.time()
+    h = read_graph(filename)
+    print 'opened %s in %.6f s' % (h, time.time() - start)
+    print h.labels[n - 1], h.out_vertices(0), h.is_connected()
+
+
+if __name__ == '__main__':
+    import sys
+    main(*sys.argv)
@@ -0,0 +1,216 @@
+""" Code example from Complexity and Computation, a book about
+exploring complexity science with Python.  Available free from
+
+http://greenteapress.com/complexity
+
+Copyright 2011 Allen B. Downey.
+Distributed under the GNU General Public License at gnu.org/licenses/gpl.html.
+
+Structural measures of large graphs, computed on the CSR arrays of
+an ArrayGraph.  Functions that take a graph accept either an
+ArrayGraph or a dict-of-dicts Graph, which is converted first.
+"""
+import math
+import multiprocessing
+
+import numpy as np
+
+from ArrayGraph import ArrayGraph
+from RandomStreams import numpy_rng
+
+
+def as_array_graph(g):
+    """Returns g as an ArrayGraph, converting a Graph if necessary."""
+    if isinstance(g, ArrayGraph):
+        return g
+    return ArrayGraph.from_graph(g)
+
+
+def gather(offsets, neighbors, vs):
+    """Returns the concatenated neighbor lists of the vertices in vs."""
+    starts = offsets[vs]
+    lens = offsets[vs + 1] - starts
+    total = lens.sum()
+    if total == 0:
+        return neighbors[:0]
+    shift = np.repeat(starts - np.cumsum(lens) + lens, lens)
+    return neighbors[shift + np.arange(total)]
+
+
+def bfs_distances(offsets, neighbors, source):
+    """Returns an array with the number of hops from source to every
+    vertex, or -1 for vertices that cannot be reached.
+
+    Breadth-first search that expands a whole frontier at a time,
+    so the work per level is done by NumPy rather than a Python loop.
+    """
+    n = len(offsets) - 1
+    dist = np.full(n, -1, dtype=np.int32)
+    dist[source] = 0
+    frontier = np.array([source], dtype=np.int64)
+    d = 0
+    while len(frontier):
+        d += 1
+        nbrs = gather(offsets, neighbors, frontier)
+        nbrs = np.unique(nbrs[dist[nbrs] < 0])
+        dist[nbrs] = d
+        frontier = nbrs
+    return dist
+
+
+def source_totals(offsets, neighbors, sources):
+    """For each source, returns the sum of distances to the vertices
+    it can reach and the number of such vertices (excluding itself),
+    as two arrays."""
+    sums = np.zeros(len(sources))
+    counts = np.zeros(len(sources), dtype=np.int64)
+    for i, s in enumerate(sources):
+        dist = bfs_distances(offsets, neighbors, s)
+        reached = dist[dist > 0]
+        sums[i] = reached.sum()
+        counts[i] = len(reached)
+    return sums, counts
+
+
+# CSR arrays shared with pool workers; set by _init_worker
+_shared = None
+
+def _init_worker(offsets, neighbors):
+    global _shared
+    _shared = offsets, neighbors
+
+def _worker_totals(sources):
+    return source_totals(_shared[0], _shared[1], sources)
+
+
+def all_source_totals(g, sources, processes=1):
+    """Runs source_totals for the given sources on graph g, split
+    across a process pool when processes is not 1."""
+    g = as_array_graph(g)
+    offsets, neighbors = g.csr()
+    sources = np.asarray(sources, dtype=np.int64)
+    if processes == 1 or len(sources) < 2:
+        return source_totals(offsets, neighbors, sources)
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    chunks = np.array_split(sources, min(len(sources), 4 * processes))
+    pool = multiprocessing.Pool(processes, _init_worker,
+                                (offsets, neighbors))
+    try:
+        results = pool.map(_worker_totals, chunks)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+    sums = np.concatenate([r[0] for r in results])
+    counts = np.concatenate([r[1] for r in results])
+    return sums, counts
+
+
+def mean_path_length(g, processes=1):
+    """Returns the average shortest path length over all ordered pairs
+    of distinct vertices that are connected by a path.
+
+    processes: number of worker processes; None uses all CPUs.
+    """
+    g = as_array_graph(g)
+    sums, counts = all_source_totals(g, np.arange(len(g)), processes)
+    return sums.sum() / counts.sum()
+
+
+def estimate_path_length(g, k, random_state=None, processes=1, z=1.96):
+    """Estimates the average shortest path length from k randomly
+    chosen sources, for graphs too big to search from every vertex.
+
+    Returns (estimate, stderr, (low, high)), where (low, high) is an
+    approximate confidence interval (95% for z=1.96).  The standard
+    error includes the finite population correction, so it is 0 when
+    k equals the number of vertices.  For a disconnected graph the
+    estimate weights each source by the number of vertices it reaches.
+    """
+    g = as_array_graph(g)
+    random_state = numpy_rng(random_state)
+    n = len(g)
+    k = min(k, n)
+    sources = random_state.choice(n, size=k, replace=False)
+    sums, counts = all_source_totals(g, sources, processes)
+
+    estimate = sums.sum() / counts.sum()
+    if k < 2:
+        return estimate, float('inf'), (0.0, float('inf'))
+
+    # ratio estimator: spread of the per-source residuals
+    residuals = sums - estimate * counts
+    var = residuals.var(ddof=1) / k / counts.mean()**2
+    var *= float(n - k) / (n - 1) if n > 1 else 0.0
+    stderr = math.sqrt(var)
+    return estimate, stderr, (estimate - z * stderr, estimate + z * stderr)
+
+
+def triangle_counts(g, max_wedges=10**7):
+    """Returns an array with the number of triangles through each
+    vertex of g.
+
+    For every vertex, each pair of neighbors (a, b) with a < b is a
+    wedge; it closes a triangle if b is in the row of a.  The rows of
+    the CSR arrays are sorted, so the keys a*n + b of all edges form a
+    sorted array and each wedge is looked up with one searchsorted.
+    Rows are processed in chunks of at most max_wedges wedges.
+    """
+    g = as_array_graph(g)
+    offsets, neighbors = g.csr()
+    n = len(g)
+    rows = np.repeat(np.arange(n, dtype=np.int64), np.diff(offsets))
+    keys = rows * n + neighbors
+    deg = np.diff(offsets)
+    counts = np.zeros(n, dtype=np.int64)
+
+    # number of wedges for which each CSR entry is the smaller neighbor
+    after = offsets[rows + 1] - np.arange(len(neighbors)) - 1
+    ends = np.cumsum(deg * (deg - 1) // 2)
+    start = 0
+    while start < n:
+        base = ends[start - 1] if start else 0
+        stop = max(np.searchsorted(ends, base + max_wedges, 'right'),
+                   start + 1)
+        lo, hi = offsets[start], offsets[stop]
+        firsts = np.repeat(np.arange(lo, hi), after[lo:hi])
+        seconds = firsts + 1 + _ramp(after[lo:hi])
+        wedge_keys = neighbors[firsts].astype(np.int64) * n + \
+            neighbors[seconds]
+        i = np.searchsorted(keys, wedge_keys)
+        i[i == len(keys)] = 0
+        closed = keys[i] == wedge_keys
+        counts[start:stop] = np.bincount(rows[firsts[closed]] - start,
+                                         minlength=stop - start)
+        start = stop
+    return counts
+
+
+def _ramp(lens):
+    """Returns concatenated ranges 0 .. l-1 for each l in lens."""
+    total = lens.sum()
+    return np.arange(total) - np.repeat(np.cumsum(lens) - lens, lens)
+
+
+def local_clustering(g):
+    """Returns an array with the local clustering coefficient of each
+    vertex: the fraction of pairs of its neighbors that are themselves
+    neighbors.  Vertices with fewer than two neighbors get 0."""
+    g = as_array_graph(g)
+    deg = g.degrees()
+    possible = deg * (deg - 1) / 2.0
+    res = np.zeros(len(g))
+    has_pairs = possible > 0
+    res[has_pairs] = triangle_counts(g)[has_pairs] / possible[has_pairs]
+    return res
+
+
+def clustering_coefficient(g):
+    """Returns (local, average): the array of local clustering
+    coefficients and their mean over all vertices (the Watts and
+    Strogatz C), with 0 for vertices of degree less than 2."""
+    local = local_clustering(g)
+    average = local.mean() if len(local) else 0.0
+    return local, average
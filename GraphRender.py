@@ -0,0 +1,265 @@
+""" Code example from Complexity and Computation, a book about
+exploring complexity science with Python.  Available free from
+
+http://greenteapress.com/complexity
+
+Copyright 2011 Allen B. Downey.
+Distributed under the GNU General Public License at gnu.org/licenses/gpl.html.
+
+Drawing graphs into PNG and SVG files, without a display.
+
+GraphWorld draws on a Tk canvas, which needs a display; render_graph
+draws the same picture with matplotlib instead, so it works in batch
+jobs on machines that have none.  It does not import GraphWorld, so
+it does not need Tk either; any layout will do, such as the ones in
+GraphWorld or a dictionary that maps each vertex to (x, y).
+
+Edges are drawn a chunk at a time, each chunk as one LineCollection
+that is drawn straight into the renderer and then thrown away, so the
+memory used does not grow with the number of edges.  For PNG the
+renderer draws into a pixel buffer; for SVG it writes each chunk to
+the file as it goes.
+"""
+import io
+import math
+import os
+from itertools import islice
+
+import numpy as np
+
+from matplotlib.figure import Figure
+from matplotlib.collections import LineCollection
+from matplotlib.backends.backend_agg import FigureCanvasAgg, RendererAgg
+from matplotlib.backends.backend_svg import RendererSVG
+import matplotlib.image
+
+from Graph import Vertex
+from Graph import Graph
+from ArrayGraph import ArrayGraph
+
+
+def edge_chunks(g, chunk_size=65536):
+    """Generates the undirected edges of Graph or ArrayGraph g as
+    (k, 2) arrays of at most chunk_size rows (i, j), i < j, where i
+    and j are the positions of the vertices in g.vertices().
+
+    For an ArrayGraph the rows of the CSR arrays are read a block at a
+    time, so no array of all the edges is made.  Self-loops, which
+    have nothing to draw, are left out.
+    """
+    if isinstance(g, ArrayGraph):
+        offsets, neighbors = g.csr()
+        n = len(g)
+        lo = 0
+        while lo < n:
+            # a block of rows with about 2 * chunk_size entries, since
+            # each edge appears in the rows of both of its ends
+            hi = np.searchsorted(offsets, offsets[lo] + 2 * chunk_size,
+                                 'right') - 1
+            hi = min(max(hi, lo + 1), n)
+            rows = np.repeat(np.arange(lo, hi, dtype=np.int64),
+                             np.diff(offsets[lo:hi + 1]))
+            nbrs = neighbors[offsets[lo]:offsets[hi]]
+            keep = rows < nbrs
+            edges = np.column_stack([rows[keep], nbrs[keep]])
+            for start in xrange(0, len(edges), chunk_size):
+                yield edges[start:start + chunk_size]
+            lo = hi
+    else:
+        index = dict((v, i) for i, v in enumerate(g.vertices()))
+        pairs = ((index[v], index[w]) for v in g for w in g[v]
+                 if index[v] < index[w])
+        while True:
+            chunk = list(islice(pairs, chunk_size))
+            if not chunk:
+                break
+            yield np.array(chunk, dtype=np.int64)
+
+
+def layout_coords(layout, vs):
+    """Returns an (n, 2) array with the position of each vertex in vs.
+
+    layout: an ArrayLayout, or anything with a pos method or that
+    maps vertices to positions.
+    """
+    if hasattr(layout, 'indices'):
+        return layout.coords[layout.indices(vs)]
+    pos = getattr(layout, 'pos', layout.__getitem__)
+    return np.array([pos(v) for v in vs], dtype=float).reshape(-1, 2)
+
+
+def circle_coords(n, radius=9):
+    """Returns an (n, 2) array with n points equally spaced around a
+    circle, like CircleLayout."""
+    theta = np.arange(n) * (math.pi * 2 / max(n, 1))
+    return radius * np.column_stack([np.cos(theta), np.sin(theta)])
+
+
+def bounds(coords, pad):
+    """Returns (xmin, xmax, ymin, ymax), a square that contains all
+    points in coords with room of pad around them."""
+    if len(coords) == 0:
+        return -1.0, 1.0, -1.0, 1.0
+    low = coords.min(axis=0)
+    high = coords.max(axis=0)
+    center = (low + high) / 2.0
+    half = max((high - low).max() / 2.0 + pad, 1e-9)
+    return (center[0] - half, center[0] + half,
+            center[1] - half, center[1] + half)
+
+
+def label_text(v):
+    """Returns the label of a Vertex, or any other label, as unicode;
+    byte strings are decoded from UTF-8, as in GraphFile."""
+    label = getattr(v, 'label', v)
+    if isinstance(label, str):
+        return label.decode('utf-8')
+    return unicode(label)
+
+
+class GraphRenderer(object):
+    """Draws a graph into a matplotlib renderer, one chunk of edges
+    at a time.
+
+    The level of detail follows GraphWorld.show_graph: labels are
+    drawn for at most label_limit vertices, and above vertex_limit the
+    vertices are drawn as dots, without outlines.
+    """
+    label_limit = 200
+    vertex_limit = 2000
+
+    def __init__(self, size=8, dpi=100, r=0.45, edge_color='0.5',
+                 linewidth=0.5, chunk_size=65536):
+        """size: width and height of the picture in inches
+        dpi: pixels per inch of a PNG
+        r: radius of the vertices, in layout units; None for no vertices
+        """
+        self.size = size
+        self.dpi = dpi
+        self.r = r
+        self.edge_color = edge_color
+        self.linewidth = linewidth
+        self.chunk_size = chunk_size
+
+    def render(self, g, layout, filename, lod=True):
+        """Draws Graph or ArrayGraph (g) using the positions in
+        (layout) and saves it in filename, whose extension, .png or
+        .svg, chooses the format.
+
+        layout: as for layout_coords, or None to put the vertices on
+        a circle.
+        lod: if False, every vertex is drawn with its label.
+        """
+        ext = os.path.splitext(filename)[1].lower()
+        if ext not in ('.png', '.svg'):
+            raise ValueError('can only render .png and .svg, not %r' %
+                             filename)
+
+        vs = g.vertices()
+        if layout is None:
+            coords = circle_coords(len(vs))
+        else:
+            coords = layout_coords(layout, vs)
+
+        if ext == '.png':
+            dpi = self.dpi
+        else:
+            dpi = 72.0
+        fig = Figure(figsize=(self.size, self.size), dpi=dpi)
+        FigureCanvasAgg(fig)
+        ax = fig.add_axes([0, 0, 1, 1])
+        ax.set_axis_off()
+        xmin, xmax, ymin, ymax = bounds(coords, (self.r or 0) * 2)
+        ax.set_xlim(xmin, xmax)
+        ax.set_ylim(ymin, ymax)
+        pixels = self.size * dpi
+
+        if ext == '.png':
+            renderer = RendererAgg(pixels, pixels, dpi)
+            self.draw(fig, ax, renderer, g, vs, coords, lod)
+            buf = np.frombuffer(renderer.buffer_rgba(), dtype=np.uint8)
+            img = buf.reshape(int(renderer.height), int(renderer.width), 4)
+            matplotlib.image.imsave(filename, img, dpi=dpi)
+        else:
+            with io.open(filename, 'w', encoding='utf-8') as fh:
+                renderer = RendererSVG(pixels, pixels, fh, filename, dpi)
+                self.draw(fig, ax, renderer, g, vs, coords, lod)
+                renderer.finalize()
+
+    def draw(self, fig, ax, renderer, g, vs, coords, lod=True):
+        """Draws the background, the edges and the vertices."""
+        fig.draw(renderer)
+
+        for edges in edge_chunks(g, self.chunk_size):
+            lines = LineCollection(coords[edges], colors=self.edge_color,
+                                   linewidths=self.linewidth)
+            self.draw_artist(ax, renderer, ax.add_collection(lines, False))
+
+        if self.r is None:
+            return
+        n = len(vs)
+        dots = lod and n > self.vertex_limit
+
+        # diameter in points, but at least one pixel
+        xmin, xmax = ax.get_xlim()
+        points_per_unit = self.size * 72.0 / (xmax - xmin)
+        diameter = max(2 * self.r * points_per_unit, 72.0 / fig.dpi)
+        for start in xrange(0, n, self.chunk_size):
+            chunk = vs[start:start + self.chunk_size]
+            xy = coords[start:start + self.chunk_size]
+            colors = [getattr(v, 'color', 'yellow') for v in chunk]
+            points = ax.scatter(xy[:, 0], xy[:, 1], s=diameter**2,
+                                c=colors, edgecolors='black',
+                                linewidths=0 if dots else 0.5)
+            self.draw_artist(ax, renderer, points)
+
+        if not lod or n <= self.label_limit:
+            fontsize = min(diameter * 0.6, 12)
+            # as in show_graph, the vertices of an ArrayGraph are
+            # named by g.labels if it has them
+            names = vs
+            if isinstance(g, ArrayGraph) and g.labels is not None:
+                names = g.labels
+            for i, (x, y) in enumerate(coords.tolist()):
+                text = ax.text(x, y, label_text(names[i]),
+                               fontsize=fontsize, ha='center',
+                               va='center', color='black')
+                self.draw_artist(ax, renderer, text)
+
+    def draw_artist(self, ax, renderer, artist):
+        """Draws an artist that was added to ax, then removes it, so
+        the figure does not keep it."""
+        artist.draw(renderer)
+        artist.remove()
+
+
+def render_graph(g, layout, filename, lod=True, **options):
+    """Draws Graph or ArrayGraph (g) with the positions in (layout)
+    and saves it in filename, as PNG or SVG according to its
+    extension.
+
+    options: passed to GraphRenderer
+    """
+    GraphRenderer(**options).render(g, layout, filename, lod)
+
+
+def main(script, n='1000', k='10', *args):
+    # a graph with Vertices, drawn with labels
+    vs = [Vertex(c) for c in 'abcdefghij']
+    g = Graph(vs)
+    g.add_all_edges()
+    render_graph(g, None, 'complete.png')
+    render_graph(g, None, 'complete.svg')
+
+    # a big random ArrayGraph, with the vertices on a circle
+    n, k = int(n), int(k)
+    g = ArrayGraph(n)
+    us = np.random.randint(0, n, n * k // 2)
+    ws = np.random.randint(0, n, n * k // 2)
+    g.add_edge_array(np.column_stack([us, ws]))
+    render_graph(g, None, 'random.png', r=None, linewidth=0.1)
+
+
+if __name__ == '__main__':
+    import sys
+    main(*sys.argv)
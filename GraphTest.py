@@ -1,11 +1,10 @@
 import string
-from Graph import Vertex
 from Graph import Edge
 from Graph import Graph
-from RandomGraph import RandomGraph
 import GraphWorld
+import ConnectivitySweep
 
-def main(script, n='1000', *args):
+def main(script, filename='connectivity.jsonl', processes=None, *args):
 
 #     # create n Vertices
 #     n = int(n)
@@ -22,17 +21,20 @@ def main(script, n='1000', *args):
 #     gw = GraphWorld.GraphWorld()
 #     gw.show_graph(g, layout)
 #     gw.mainloop()
-    for n in range(100, 10000, 1000):
-        for p in range(1, 100):
-            p = p / 100.0
-            success = 0
-            for each in range(1000):
-                vs = [Vertex(str(c)) for c in range(n)]
-                g = RandomGraph(vs)
-                g.add_random_edges(p)
-                success += g.is_connected()
-            pct = float(success) / 1000
-            print 'N: %s\t\tp: %s\t\t pct connected: %s' % (n, p, pct)
+
+    # the trials run in a process pool and each result is appended
+    # to (filename) as it completes; running again with the same file
+    # resumes an interrupted sweep.  Each trial finds its connectivity
+    # threshold once with a DisjointSet, which covers every p.
+    if processes is not None:
+        processes = int(processes)
+    ns = range(100, 10000, 1000)
+    ps = [p / 100.0 for p in range(1, 100)]
+    results = ConnectivitySweep.sweep(ns, ps, 1000, filename,
+                                      processes=processes)
+    for r in results:
+        print ('N: %(n)s\t\tp: %(p)s\t\t pct connected: %(fraction)s '
+               '(%(ci_low).3f - %(ci_high).3f)' % r)
 
 if __name__ == '__main__':
     import sys
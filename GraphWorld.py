@@ -9,19 +9,20 @@ Distributed under the GNU General Public License at gnu.org/licenses/gpl.html.
 """
 
 import string
-import random
 import math
 
-from itertools import chain
+import numpy as np
+import Tkinter
 
 try:
-    from Gui import Gui, GuiCanvas
+    from Gui import Gui, GuiCanvas, CanvasTransform
 except ImportError:
-    from swampy.Gui import Gui, GuiCanvas
+    from swampy.Gui import Gui, GuiCanvas, CanvasTransform
 
 from Graph import Vertex
-from Graph import Edge
 from Graph import Graph
+from ArrayGraph import ArrayGraph
+from RandomStreams import python_rng, numpy_rng
 
 
 class GraphCanvas(GuiCanvas):
@@ -49,6 +50,37 @@ class GraphCanvas(GuiCanvas):
         tag = self.line([v.pos, w.pos])
         return tag
 
+    def pixels(self, coords):
+        """Transforms an (n, 2) array of positions to pixel
+        coordinates, with NumPy if the canvas only has
+        CanvasTransforms."""
+        coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+        if not all(type(t) is CanvasTransform for t in self.transforms):
+            return np.array(self.trans(coords.tolist()),
+                            dtype=float).reshape(-1, 2)
+        for t in self.transforms:
+            coords = coords * [t.scale[0], -t.scale[1]] + t.shift
+        return coords
+
+    def draw_polylines(self, points, walks, tags, fill='black'):
+        """Draws a polyline through the pixel coordinates points[walk]
+        for each walk (an array of indices)."""
+        for walk in walks:
+            self.create_line(points[walk].ravel().tolist(), fill=fill,
+                             tags=tags)
+
+    def draw_raster(self, img, tags, fill='black'):
+        """Draws a boolean array with the size of the canvas as an
+        image, with the set pixels in color (fill).  Returns the
+        PhotoImage, which must be kept as long as it is shown."""
+        height, width = img.shape
+        photo = Tkinter.PhotoImage(master=self, width=width, height=height)
+        colors = np.array([self['bg'], fill])
+        rows = ['{%s}' % ' '.join(row) for row in colors[img.astype(int)]]
+        photo.put(' '.join(rows), to=(0, 0))
+        self.create_image(0, 0, image=photo, anchor='nw', tags=tags)
+        return photo
+
 
 class GraphWorld(Gui):
     """GraphWorld is a Gui that has a Graph Canvas and control buttons."""
@@ -77,30 +109,228 @@ class GraphWorld(Gui):
         self.bu(text='Quit', command=self.quit)
         self.endrow()
 
-    def show_graph(self, g, layout):
-        """Draws the Vertices and Edges of Graph (g) using the
-        positions in Layout (layout).
+    # level of detail: the most vertices drawn with labels, the most
+    # drawn as circles, and the most edges drawn as lines, rather
+    # than as pixels of an image
+    label_limit = 200
+    vertex_limit = 2000
+    edge_limit = 5000
+
+    tag = 'graph'
+
+    def show_graph(self, g, layout, r=0.45, lod=True):
+        """Draws the Vertices and Edges of Graph or ArrayGraph (g)
+        using the positions in Layout (layout).
+
+        Each undirected edge is drawn once, and the edges are joined
+        into long polylines (see edge_walks), so a graph takes a few
+        canvas items instead of one per edge.  Vertices and edges
+        that are off the canvas are not drawn.
+
+        r: radius of the vertices
+        lod: if True, big graphs are drawn with less detail: without
+        labels when more than label_limit vertices are on the canvas,
+        with vertices as dots when more than vertex_limit are, and
+        with the edges drawn into an image when there are more than
+        edge_limit on the canvas.
         """
-
-        # copy the positions from the layout into the Vertex objects
-        for v in g.vertices():
-            v.pos = layout.pos(v)
-        
-        # draw the edges and store the tags in self.etags, which maps
-        # from Edges to their tags
         c = self.canvas
-        self.etags = {}
-        for v in g:
-            self.etags[v] = [c.draw_edge(e) for e in g.out_edges(v)]
-
-        # draw the vertices and store their tags in a list
-        self.vtags = [c.draw_vertex(v) for v in g]
+        vs = g.vertices()
+        index = dict((v, i) for i, v in enumerate(vs))
+
+        coords = np.array([layout.pos(v) for v in vs],
+                          dtype=float).reshape(-1, 2)
+
+        # the vertices of an ArrayGraph are ints, named by g.labels,
+        # which may be Vertices; Vertices get a copy of their positions
+        names = vs
+        if isinstance(g, ArrayGraph):
+            if g.labels is not None:
+                names = g.labels
+        else:
+            for v, p in zip(vs, coords.tolist()):
+                v.pos = p
+
+        points = c.pixels(coords)
+        width, height = c.width, c.height
+        r_px = abs(c.pixels([[r, 0]])[0, 0] - c.pixels([[0, 0]])[0, 0])
+
+        edges = edge_index_array(g, index)
+        visible, start, end = clip_segments(points[edges[:, 0]],
+                                            points[edges[:, 1]],
+                                            0, 0, width, height)
+        edges = edges[visible]
+
+        x, y = points[:, 0], points[:, 1]
+        on_canvas = np.flatnonzero((x >= -r_px) & (x <= width + r_px) &
+                                   (y >= -r_px) & (y <= height + r_px))
+
+        raster_edges = lod and len(edges) > self.edge_limit
+        dots = lod and len(on_canvas) > self.vertex_limit
+        self.images = []
+        if raster_edges or dots:
+            img = np.zeros((height, width), dtype=bool)
+            if raster_edges:
+                rasterize(img, start[visible], end[visible])
+            if dots:
+                dot_radius = min(max(int(r_px), 1), 2)
+                rasterize_points(img, points[on_canvas], dot_radius)
+            self.images.append(c.draw_raster(img, self.tag))
+
+        if not raster_edges:
+            c.draw_polylines(points, edge_walks(edges, len(vs)), self.tag)
+
+        if dots:
+            return
+        labels = not lod or len(on_canvas) <= self.label_limit
+        for i in on_canvas.tolist():
+            v = vs[i]
+            px, py = points[i].tolist()
+            color = getattr(v, 'color', 'yellow')
+            c.create_oval(px - r_px, py - r_px, px + r_px, py + r_px,
+                          fill=color, tags=self.tag)
+            if labels:
+                name = getattr(names[i], 'label', names[i])
+                c.create_text(px, py, text=name, fill='black',
+                              tags=self.tag)
 
     def clear(self):
         """Delete all canvas items."""
-        tags = chain(self.vtags, *self.etags.itervalues())
-        for tag in tags:
-            self.canvas.delete(tag)
+        self.canvas.delete(self.tag)
+        self.images = []
+
+
+def edge_index_array(g, index):
+    """Returns an (m, 2) array with a row (i, j), i < j, for each
+    undirected edge of Graph or ArrayGraph g, where i and j are the
+    indices of its vertices in (index), a map from vertex to index."""
+    if isinstance(g, ArrayGraph):
+        edges = np.fromiter((index[v] for v in g.vertices()),
+                            dtype=np.int64, count=len(g))[g.edge_array()]
+        return np.sort(edges, axis=1)
+    pairs = [(index[v], index[w]) for v in g
+             for w in g[v] if index[v] < index[w]]
+    return np.array(pairs, dtype=np.int64).reshape(-1, 2)
+
+
+def clip_segments(p0, p1, xmin, ymin, xmax, ymax):
+    """Clips line segments to a rectangle (Liang and Barsky, 1984).
+
+    p0, p1: (m, 2) arrays with the ends of the segments
+
+    Returns (visible, q0, q1): a boolean array that is True for the
+    segments that cross the rectangle, and the ends of the clipped
+    segments (meaningful only where visible is True).
+    """
+    d = p1 - p0
+    t0 = np.zeros(len(d))
+    t1 = np.ones(len(d))
+    visible = np.ones(len(d), dtype=bool)
+    for p, q in [(-d[:, 0], p0[:, 0] - xmin), (d[:, 0], xmax - p0[:, 0]),
+                 (-d[:, 1], p0[:, 1] - ymin), (d[:, 1], ymax - p0[:, 1])]:
+        visible &= (p != 0) | (q >= 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = q / p
+        t0 = np.where(p < 0, np.maximum(t0, ratio), t0)
+        t1 = np.where(p > 0, np.minimum(t1, ratio), t1)
+    visible &= t0 <= t1
+    return visible, p0 + t0[:, np.newaxis] * d, p0 + t1[:, np.newaxis] * d
+
+
+def edge_walks(edges, n, max_points=4096):
+    """Joins edges into walks, so they can be drawn as a few long
+    polylines instead of one line each.
+
+    A depth-first search goes along each edge and, when it gets stuck,
+    back along the way it came, so every edge is in a walk and no two
+    consecutive vertices of a walk are not joined by an edge.
+
+    edges: (m, 2) array of vertex indices
+    n: number of vertices
+    max_points: longer walks are split into pieces of this length
+
+    Returns a list of arrays of vertex indices.
+    """
+    m = len(edges)
+    if m == 0:
+        return []
+    us = np.concatenate([edges[:, 0], edges[:, 1]])
+    order = np.argsort(us, kind='mergesort')
+    ws = np.concatenate([edges[:, 1], edges[:, 0]])[order].tolist()
+    ids = np.concatenate([np.arange(m), np.arange(m)])[order].tolist()
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(us, minlength=n))])
+    ends = offsets[1:].tolist()
+    slot = offsets[:-1].tolist()
+
+    drawn = [False] * m
+    walks = []
+    for s in range(n):
+        if slot[s] == ends[s]:
+            continue
+        walk = [s]
+        stack = [s]
+        last = 1
+        while stack:
+            v = stack[-1]
+            i = slot[v]
+            while i < ends[v] and drawn[ids[i]]:
+                i += 1
+            if i == ends[v]:
+                slot[v] = i
+                stack.pop()
+                if stack:
+                    walk.append(stack[-1])
+                continue
+            slot[v] = i + 1
+            drawn[ids[i]] = True
+            walk.append(ws[i])
+            stack.append(ws[i])
+            last = len(walk)
+
+        # the steps back after the last new edge draw nothing new
+        walk = np.array(walk[:last], dtype=np.int64)
+        for j in range(0, len(walk) - 1, max_points - 1):
+            walks.append(walk[j:j + max_points])
+    return walks
+
+
+def rasterize(img, p0, p1, max_pixels=1 << 22):
+    """Sets the pixels of boolean array img along the line segments
+    from p0 to p1, (m, 2) arrays of pixel coordinates, which should
+    already be clipped to the image.  Segments are drawn in chunks of
+    about max_pixels pixels, so memory use is bounded."""
+    height, width = img.shape
+    d = p1 - p0
+    steps = np.ceil(np.abs(d).max(axis=1)).astype(np.int64) + 1
+    total = np.cumsum(steps)
+    start = 0
+    while start < len(steps):
+        base = total[start - 1] if start else 0
+        stop = max(np.searchsorted(total, base + max_pixels, 'right'),
+                   start + 1)
+        counts = steps[start:stop]
+        seg = np.repeat(np.arange(start, stop), counts)
+        ramp = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) -
+                                                   counts, counts)
+        t = ramp / np.maximum(steps[seg] - 1, 1).astype(float)
+        x = np.rint(p0[seg, 0] + t * d[seg, 0]).astype(np.int64)
+        y = np.rint(p0[seg, 1] + t * d[seg, 1]).astype(np.int64)
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        img[y[inside], x[inside]] = True
+        start = stop
+
+
+def rasterize_points(img, points, r=1):
+    """Sets the pixels of boolean array img in a square of radius r
+    around each of the (n, 2) array of pixel coordinates points."""
+    height, width = img.shape
+    center = np.rint(points).astype(np.int64)
+    for dx in range(-r + 1, r):
+        for dy in range(-r + 1, r):
+            x = center[:, 0] + dx
+            y = center[:, 1] + dy
+            inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+            img[y[inside], x[inside]] = True
 
 
 class Layout(dict):
@@ -148,16 +378,19 @@ class RandomLayout(Layout):
     """Create a layout with each Vertex at a random position in
     [[-max, -max], [max, max]]."""
 
-    def __init__(self, g, max=10):
-        """Creates a layout for Graph (g)"""
+    def __init__(self, g, max=10, rng=None):
+        """Creates a layout for Graph (g)
+
+        rng: random.Random, int seed or None (see RandomStreams)."""
         self.max = max
+        self.rng = python_rng(rng)
         for v in g.vertices():
             self[v] = self.random_pos()
 
     def random_pos(self):
         """choose a random position and return it as a tuple"""
-        x = random.uniform(-self.max, self.max)
-        y = random.uniform(-self.max, self.max)
+        x = self.rng.uniform(-self.max, self.max)
+        y = self.rng.uniform(-self.max, self.max)
         return x, y
 
     def spread_vertex(self, v, others, min_dist=1.0):
@@ -174,15 +407,504 @@ class RandomLayout(Layout):
             min_dist *= 0.9
             self[v] = self.random_pos()
 
-    def spread_vertices(self):
+    def spread_vertices(self, min_dist=1.0):
         """Moves the vertices around until no two are closer together
-        than a minimum distance."""
+        than a minimum distance.
+
+        This does the same as calling spread_vertex for each vertex,
+        but the vertices are kept in a SpatialHash, so each position
+        is only checked against the vertices nearby.
+
+        The time grows with the density, since crowded vertices need
+        more retries: for 100,000 vertices and min_dist=1, about 5 s
+        with max=sqrt(n), a quarter of a vertex per unit area, and
+        about 18 s with max=sqrt(n)/2, one per unit area.
+        """
         vs = self.keys()
-        others = vs[:]
-        for v in vs:
-            others.remove(v)
-            self.spread_vertex(v, others)
-            others.append(v)
+        pos = np.array([self[v] for v in vs], dtype=float).reshape(-1, 2)
+
+        # enough levels that the smallest cells hold about one vertex
+        area = np.prod(pos.ptp(axis=0)) if len(pos) else 0
+        levels = 2
+        if area > 0:
+            levels += max(int(math.log(min_dist**2 * len(pos) / area, 4)), 0)
+        grid = SpatialHash(pos, min_dist, levels)
+
+        for i, v in enumerate(vs):
+            grid.discard(i)
+            dist = min_dist
+            while grid.within(self[v], dist):
+                dist *= 0.9
+                self[v] = self.random_pos()
+            pos[i] = self[v]
+            grid.add(i)
+
+
+class SpatialHash(object):
+    """Finds the points near a position, for an array of points that
+    can be added and removed.
+
+    The points are kept in square cells of several sizes: size,
+    size/2, size/4 and so on.  Each level maps the (x, y) index of a
+    cell to the set of points in it.
+    """
+
+    def __init__(self, pos, size=1.0, levels=2):
+        """pos: (n, 2) array of positions, which is not copied; a point
+        must not move while it is in the hash.
+        size: the largest distance that will be searched for.
+        levels: number of cell sizes.
+        """
+        self.pos = pos
+        self.sizes = [size / 2.0**k for k in range(levels)]
+        self.cells = [{} for k in range(levels)]
+        for i in range(len(pos)):
+            self.add(i)
+
+    def cell(self, p, k):
+        """Index of the cell at level k that contains position p."""
+        size = self.sizes[k]
+        return int(math.floor(p[0] / size)), int(math.floor(p[1] / size))
+
+    def add(self, i):
+        """Adds point i at its current position."""
+        p = self.pos[i].tolist()
+        for k, cells in enumerate(self.cells):
+            cells.setdefault(self.cell(p, k), set()).add(i)
+
+    def discard(self, i):
+        """Removes point i."""
+        p = self.pos[i].tolist()
+        for k, cells in enumerate(self.cells):
+            cells[self.cell(p, k)].discard(i)
+
+    def near(self, p, dist):
+        """Returns a list of the points in the cells around p,
+        which include all points within dist (<= size) of p."""
+        # the smallest cells that are at least dist wide
+        k = min(int(math.log(self.sizes[0] / dist, 2)), len(self.sizes) - 1)
+        cells = self.cells[k]
+        cx, cy = self.cell(p, k)
+        return [j for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                for j in cells.get((cx + dx, cy + dy), ())]
+
+    def within(self, p, dist):
+        """Returns True if any point is within dist (<= size) of p."""
+        # any point in a cell whose diagonal is at most dist is close
+        # enough; checking that first avoids most distance computations
+        # when the points are crowded
+        k = int(math.ceil(math.log(self.sizes[0] * math.sqrt(2) / dist, 2)))
+        if k < len(self.sizes) and self.cells[k].get(self.cell(p, k)):
+            return True
+
+        near = self.near(p, dist)
+        if len(near) > 50:
+            diff = self.pos[near] - p
+            return np.sqrt((diff**2).sum(axis=1)).min() <= dist
+
+        # for a few points, a loop is faster than making arrays
+        x, y = p
+        for j in near:
+            xj, yj = self.pos[j].tolist()
+            if math.sqrt((xj - x)**2 + (yj - y)**2) <= dist:
+                return True
+        return False
+
+
+
+class ArrayLayout(object):
+    """A layout that keeps the positions in an (n, 2) array, with a
+    map from each vertex to its row, so that distances to many
+    vertices are computed at once with NumPy.
+
+    It has the same pos, distance_between and sort_by_distance methods
+    as Layout, and can be read and written like a dictionary.
+    """
+
+    def __init__(self, g, layout=None):
+        """Creates a layout for Graph (g), with the positions from
+        another layout, or all at (0, 0)."""
+        vs = g.vertices()
+        coords = np.zeros((len(vs), 2))
+        if layout is not None:
+            coords[:] = [layout.pos(v) for v in vs]
+        self.set_coords(vs, coords)
+
+    @classmethod
+    def from_coords(cls, vs, coords):
+        """Makes a layout for the vertices in vs, with the positions
+        in the rows of the (n, 2) array coords."""
+        layout = cls.__new__(cls)
+        layout.set_coords(list(vs), np.array(coords, dtype=float))
+        return layout
+
+    def set_coords(self, vs, coords):
+        self.vs = vs
+        self.index = dict((v, i) for i, v in enumerate(vs))
+        self.coords = coords
+
+    def __len__(self):
+        return len(self.vs)
+
+    def __iter__(self):
+        return iter(self.vs)
+
+    def __contains__(self, v):
+        return v in self.index
+
+    def __getitem__(self, v):
+        return tuple(self.coords[self.index[v]].tolist())
+
+    def __setitem__(self, v, p):
+        i = self.index.get(v)
+        if i is None:
+            self.index[v] = i = len(self.vs)
+            self.vs.append(v)
+            self.coords = np.vstack([self.coords, [p]])
+        else:
+            self.coords[i] = p
+
+    def keys(self):
+        return list(self.vs)
+
+    def pos(self, v):
+        """Returns the position of this Vertex as a tuple."""
+        return self[v]
+
+    def indices(self, vs):
+        """Returns an array with the row of each vertex in vs."""
+        index = self.index
+        return np.fromiter((index[v] for v in vs), dtype=np.int64,
+                           count=len(vs))
+
+    def distance_between(self, v1, v2):
+        """Computes the Euclidean distance between two vertices."""
+        d = self.coords[self.index[v1]] - self.coords[self.index[v2]]
+        return math.sqrt(d.dot(d))
+
+    def distances_between(self, vs, ws):
+        """Returns an array with the distance between each vertex in
+        vs and the corresponding vertex in ws, such as the ends of a
+        list of edges."""
+        d = self.coords[self.indices(vs)] - self.coords[self.indices(ws)]
+        return np.sqrt((d**2).sum(axis=1))
+
+    def distances(self, v, others=None):
+        """Returns an array with the distance from v to each vertex in
+        others (by default, all vertices in the layout, in order)."""
+        rows = self.coords if others is None else \
+            self.coords[self.indices(others)]
+        d = rows - self.coords[self.index[v]]
+        return np.sqrt((d**2).sum(axis=1))
+
+    def pairwise_distances(self, vs=None):
+        """Returns the matrix of distances between all pairs of the
+        vertices in vs (by default, all vertices).  It has n**2
+        entries, so use it only for small sets of vertices."""
+        rows = self.coords if vs is None else self.coords[self.indices(vs)]
+        d = rows[:, np.newaxis, :] - rows[np.newaxis, :, :]
+        return np.sqrt((d**2).sum(axis=2))
+
+    def sort_by_distance(self, v, others, k=None):
+        """Returns a list of the vertices in others sorted in
+        increasing order by their distance from v.
+
+        k: if given, returns only the k nearest.  They are found with
+        argpartition, which takes O(n) instead of O(n log n) for a
+        full sort, and only those k are sorted.
+        """
+        others = list(others)
+        d = self.distances(v, others)
+        if k is not None and k < len(d):
+            nearest = np.argpartition(d, k - 1)[:k] if k > 0 else \
+                np.zeros(0, dtype=np.int64)
+            order = nearest[np.argsort(d[nearest], kind='mergesort')]
+        else:
+            order = np.argsort(d, kind='mergesort')
+        return [others[i] for i in order]
+
+    def nearest(self, v, k):
+        """Returns the k vertices nearest v (not counting v), in
+        increasing order of distance."""
+        d = self.distances(v)
+        d[self.index[v]] = np.inf
+        k = min(k, len(d) - 1)
+        if k <= 0:
+            return []
+        nearest = np.argpartition(d, k - 1)[:k]
+        order = nearest[np.argsort(d[nearest], kind='mergesort')]
+        return [self.vs[i] for i in order]
+
+    def within(self, v, r):
+        """Returns the vertices within distance r of v (not counting
+        v), in increasing order of distance."""
+        d = self.distances(v)
+        d[self.index[v]] = np.inf
+        close = np.flatnonzero(d <= r)
+        order = close[np.argsort(d[close], kind='mergesort')]
+        return [self.vs[i] for i in order]
+
+
+
+class QuadTree(object):
+    """A quadtree over an (n, 2) array of points, for computing
+    forces between all pairs of points in O(n log n) with the
+    Barnes-Hut approximation.
+
+    Level L divides the bounding square of the points into 2**L by
+    2**L cells.  Each level stores the non-empty cells, sorted by key,
+    with the number of points in each and their center of mass, so
+    the tree is built with a few NumPy calls per level.
+    """
+
+    def __init__(self, coords, depth=None):
+        """coords: (n, 2) array of positions
+        depth: number of levels below the root; by default enough
+               that the deepest cells hold a few points each.
+        """
+        n = len(coords)
+        if depth is None:
+            depth = int(math.ceil(math.log(max(n, 2), 4))) + 1
+        self.coords = coords
+        self.depth = depth
+
+        lo = coords.min(axis=0)
+        side = float((coords.max(axis=0) - lo).max()) * (1 + 1e-9) or 1.0
+        scaled = (coords - lo) / side
+
+        self.keys = []        # sorted keys of the non-empty cells
+        self.cell_of = []     # index of the cell of each point
+        self.mass = []        # number of points in each cell
+        self.center = []      # center of mass of each cell
+        self.width = []       # width of the cells at each level
+        for level in range(depth + 1):
+            m = 2**level
+            ij = np.minimum((scaled * m).astype(np.int64), m - 1)
+            keys, inv = np.unique(ij[:, 0] * m + ij[:, 1],
+                                  return_inverse=True)
+            mass = np.bincount(inv).astype(float)
+            center = np.column_stack([np.bincount(inv, coords[:, 0]),
+                                      np.bincount(inv, coords[:, 1])])
+            self.keys.append(keys)
+            self.cell_of.append(inv)
+            self.mass.append(mass)
+            self.center.append(center / mass[:, np.newaxis])
+            self.width.append(side / m)
+
+        # children[L][c] are the indices of the four children of
+        # cell c of level L in level L+1, or -1 for empty children
+        self.children = []
+        for level in range(depth):
+            m = 2**level
+            i, j = np.divmod(self.keys[level], m)
+            kids = [(2 * i + a) * 2 * m + 2 * j + b
+                    for a in (0, 1) for b in (0, 1)]
+            kids = np.column_stack(kids)
+            next_keys = self.keys[level + 1]
+            pos = np.minimum(np.searchsorted(next_keys, kids),
+                             len(next_keys) - 1)
+            self.children.append(np.where(next_keys[pos] == kids, pos, -1))
+
+        # the points sorted by their cell at the deepest level, and
+        # where each cell starts in that order
+        self.order = np.argsort(self.cell_of[depth], kind='mergesort')
+        mass = self.mass[depth].astype(np.int64)
+        self.starts = np.cumsum(mass) - mass
+
+    def repulsion(self, strength, theta=0.8, chunk_size=8192):
+        """Returns an (n, 2) array with the sum, for each point, of the
+        forces strength * d / |d|**2 from every other point, where d
+        is the vector from the other point to this one.
+
+        The points in a cell are treated as one point at their center
+        of mass when the cell's width is less than theta times its
+        distance from the point; the points in the deepest cells are
+        always taken one at a time, so theta=0 gives the exact forces.
+        The search goes down the tree a level at a time for a chunk of
+        (chunk_size) points at once, like a breadth-first search.
+        """
+        n = len(self.coords)
+        force = np.zeros((n, 2))
+        for start in range(0, n, chunk_size):
+            stop = min(start + chunk_size, n)
+            force[start:stop] = self.chunk_repulsion(start, stop, strength,
+                                                     theta)
+        return force
+
+    def chunk_repulsion(self, start, stop, strength, theta):
+        """Returns the repulsion on the points from start to stop."""
+        coords = self.coords
+        size = stop - start
+        force = np.zeros((size, 2))
+        pts = np.arange(start, stop)
+        cells = np.zeros(size, dtype=np.int64)
+
+        for level in range(self.depth + 1):
+            if not len(pts):
+                break
+            mass = self.mass[level][cells]
+            if level == self.depth:
+                # the points in the deepest cells are taken one by one
+                counts = mass.astype(np.int64)
+                total = counts.sum()
+                shift = np.repeat(self.starts[cells] - np.cumsum(counts) +
+                                  counts, counts)
+                others = self.order[shift + np.arange(total)]
+                p = np.repeat(pts, counts)
+                keep = others != p
+                p, c, w = p[keep], coords[others[keep]], 1.0
+            else:
+                center = self.center[level][cells]
+                own = self.cell_of[level][pts] == cells
+                d = coords[pts] - center
+                dist2 = (d**2).sum(axis=1)
+                accept = ~own & ((mass == 1) |
+                                 (self.width[level]**2 < theta**2 * dist2))
+                p, c, w = pts[accept], center[accept], mass[accept]
+
+            d = coords[p] - c
+            dist2 = (d**2).sum(axis=1)
+            nonzero = dist2 > 0
+            w = w[nonzero] if np.ndim(w) else w
+            f = d[nonzero] * (strength * w / dist2[nonzero])[:, np.newaxis]
+            p = p[nonzero] - start
+            force[:, 0] += np.bincount(p, f[:, 0], minlength=size)
+            force[:, 1] += np.bincount(p, f[:, 1], minlength=size)
+
+            if level == self.depth:
+                break
+            # open the other cells, except a point's own cell when
+            # the point is alone in it
+            expand = ~accept & ~(own & (mass == 1))
+            kids = self.children[level][cells[expand]]
+            present = kids >= 0
+            pts = np.repeat(pts[expand], 4)[present.ravel()]
+            cells = kids[present]
+        return force
+
+
+class SpringLayout(ArrayLayout):
+    """A force-directed layout (Fruchterman and Reingold, 1991):
+    neighbors attract each other, all vertices repel each other, and
+    the vertices move a limited distance, which shrinks over time,
+    in the direction of the total force.
+
+    The repulsion between all pairs is approximated with a QuadTree,
+    so each iteration takes O(n log n); the attraction is computed
+    for all edges at once.
+
+    The simulation runs in its own coordinates, in self.state, with
+    no walls; after each run the positions are scaled to fit in
+    [-size, size].
+    """
+
+    def __init__(self, g, iterations=50, size=9, theta=0.8, layout=None,
+                 random_state=None):
+        """Creates a layout for Graph or ArrayGraph (g).
+
+        iterations: number of steps to run
+        size: the vertices are placed in [-size, size] in x and y
+        theta: accuracy of the repulsion; 0 computes it exactly
+        layout: starting positions; by default, random
+        random_state: RandomState, int seed or None (see RandomStreams)
+        """
+        ArrayLayout.__init__(self, g, layout)
+        self.size = size
+        self.theta = theta
+        self.random_state = numpy_rng(random_state)
+        if layout is None:
+            self.state = self.random_state.uniform(-size, size,
+                                                   (len(self), 2))
+        else:
+            self.state = self.coords.copy()
+        self.set_edges(g)
+        self.run(iterations)
+
+    def set_edges(self, g):
+        """Reads the edges of g, which may have new vertices; they
+        start at random positions."""
+        new = [v for v in g.vertices() if v not in self]
+        if new:
+            lo, hi = self.state.min(axis=0), self.state.max(axis=0)
+            for v in new:
+                self[v] = (0, 0)
+            self.state = np.vstack([self.state,
+                                    self.random_state.uniform(lo, hi,
+                                                              (len(new), 2))])
+
+        self.edges = edge_index_array(g, self.index)
+
+        # ideal distance between vertices
+        self.k = 2.0 * self.size / math.sqrt(max(len(self), 1))
+
+    def step(self, temperature):
+        """Moves each vertex at most temperature in the direction of
+        the force on it; returns the largest move."""
+        state = self.state
+        n = len(state)
+        if n < 2:
+            return 0.0
+        k = self.k
+        disp = QuadTree(state).repulsion(k * k, self.theta)
+
+        i, j = self.edges[:, 0], self.edges[:, 1]
+        d = state[i] - state[j]
+        f = d * (np.sqrt((d**2).sum(axis=1)) / k)[:, np.newaxis]
+        for axis in (0, 1):
+            pull = np.bincount(j, f[:, axis], minlength=n) - \
+                np.bincount(i, f[:, axis], minlength=n)
+            disp[:, axis] += pull
+
+        length = np.sqrt((disp**2).sum(axis=1))
+        move = np.minimum(length, temperature)
+        scale = np.where(length > 0, move / np.maximum(length, 1e-300), 0)
+        state += disp * scale[:, np.newaxis]
+        return move.max()
+
+    def run(self, iterations, temperature=None, tol=1e-3):
+        """Runs up to (iterations) steps, with the temperature falling
+        linearly from (temperature) to 0, then updates the positions.
+        Stops early if no vertex moves more than tol times the ideal
+        distance.
+
+        Returns the number of steps run.
+        """
+        if temperature is None:
+            temperature = self.size / 5.0
+        steps = iterations
+        for it in range(iterations):
+            t = temperature * (1 - float(it) / iterations)
+            if self.step(t) < tol * self.k:
+                steps = it + 1
+                break
+        self.fit()
+        return steps
+
+    def fit(self):
+        """Sets the positions to the state, centered and scaled to
+        fit in [-size, size]."""
+        if not len(self.state):
+            return
+        lo, hi = self.state.min(axis=0), self.state.max(axis=0)
+        extent = (hi - lo).max() / 2.0
+        scale = self.size / extent if extent > 0 else 1.0
+        self.coords = (self.state - (lo + hi) / 2.0) * scale
+
+    def refine(self, g=None, iterations=20, temperature=None):
+        """Improves the layout after the graph has changed, such as
+        after rewiring, starting from the current state.
+
+        The default starting temperature is the ideal distance between
+        vertices, much lower than for a new layout, so the vertices
+        stay close to where they were.
+
+        g: the changed graph; by default the edges are not reread.
+        """
+        if g is not None:
+            self.set_edges(g)
+        if temperature is None:
+            temperature = self.k
+        return self.run(iterations, temperature)
 
 
 
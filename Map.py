@@ -7,17 +7,17 @@ Copyright 2011 Allen B. Downey.
 Distributed under the GNU General Public License at gnu.org/licenses/gpl.html.
 """
 
+import gc
 import string
 import listsum
 import random
+from itertools import cycle
+from timeit import default_timer
+import numpy as np
 import matplotlib.pyplot as pyplot
 
-def etime():
-    """See how much user and system time this process has used
-    so far and return the sum."""
-
-    user, sys, chuser, chsys, real = os.times()
-    return user+sys
+from Benchmark import measure
+import BenchPlot
 
 # Exercise 3  
 # Write a function called bisection that takes a sorted list 
@@ -30,10 +30,10 @@ def bisect(sorted_list, target_value):
     lo = 0
     hi = len(sorted_list)
     while lo < hi:
-        mid = (lo + hi) / 2
-        if target_value == a[mid]:
+        mid = (lo + hi) // 2
+        if target_value == sorted_list[mid]:
             return mid
-        elif target_value < a[mid]:
+        elif target_value < sorted_list[mid]:
             hi = mid
         else:
             lo = mid + 1
@@ -65,8 +65,14 @@ class BetterMap(object):
     and the built-in function hash() to determine which LinearMap
     to put each key into."""
 
-    def __init__(self, n=100):
-        """Appends (n) LinearMaps onto (self)."""
+    def __init__(self, n=100, lazy=False):
+        """Appends (n) LinearMaps onto (self).
+
+        If lazy is True, each LinearMap is only made when a key first
+        maps to it, so making a big BetterMap is cheap."""
+        if lazy:
+            self.maps = [None] * n
+            return
         self.maps = []
         for i in range(n):
             self.maps.append(LinearMap())
@@ -76,8 +82,11 @@ class BetterMap(object):
 
     def find_map(self, k):
         """Finds the right LinearMap for key (k)."""
-        index = hash(k) % len(self)
-        return self.maps[index]
+        index = hash(k) % len(self.maps)
+        m = self.maps[index]
+        if m is None:
+            m = self.maps[index] = LinearMap()
+        return m
 
     def add(self, k, v):
         """Adds a new item to the appropriate LinearMap for key (k)."""
@@ -91,6 +100,8 @@ class BetterMap(object):
 
     def iteritems(self):
         for m in self.maps:
+            if m is None:
+                continue
             for k, v in m.items:
                 yield k, v
 
@@ -101,20 +112,51 @@ class HashMap(object):
     of LinearMaps.
 
     The amortized cost of add should be O(1) provided that the
-    implementation of sum in resize is linear."""
+    implementation of sum in resize is linear.
 
-    def __init__(self):
+    In incremental mode, resize does not move the items at once: the
+    old map is kept next to the new one, and each add or get moves
+    the items of (step) old LinearMaps, so no single operation pays
+    for rehashing everything (like the progressive rehash in Redis).
+    The old map has one LinearMap per item and the next resize comes
+    after as many adds, so with step >= 1 it is empty by then.
+
+    This bounds the slowest add, not the typical one: moving items
+    makes every add during a resize a little slower, so the median
+    and 99th percentile are higher than with the all-at-once resize
+    (see compare_resize)."""
+
+    def __init__(self, incremental=False, step=1):
         """Starts with 2 LinearMaps and 0 items."""
         self.maps = BetterMap(2)
         self.num = 0
+        self.incremental = incremental
+        self.step = step
+        self.old = None
+        self.cursor = 0
 
     def get(self, k):
         """Looks up the key (k) and returns the corresponding value,
         or raises KeyError if the key is not found."""
+        if self.old is None:
+            return self.maps.get(k)
+
+        # during an incremental resize, k may still be in an old
+        # LinearMap that has not been moved; moved ones are None
+        self.migrate()
+        old = self.old
+        if old is not None:
+            m = old.maps[hash(k) % len(old.maps)]
+            if m is not None:
+                for key, val in m.items:
+                    if key == k:
+                        return val
         return self.maps.get(k)
 
     def add(self, k, v):
         """Resize the map if necessary and adds the new item."""
+        if self.old is not None:
+            self.migrate()
         if self.num == len(self.maps):
             self.resize()
 
@@ -122,41 +164,678 @@ class HashMap(object):
         self.num += 1
 
     def resize(self):
-        """Makes a new map, twice as big, and rehashes the items."""
+        """Makes a new map, twice as big, and rehashes the items,
+        or in incremental mode, starts moving them."""
+        if self.incremental:
+            if self.old is not None:
+                self.migrate(len(self.old.maps))
+            self.old = self.maps
+            self.cursor = 0
+            self.maps = BetterMap(self.num * 2, lazy=True)
+            return
+
         new_maps = BetterMap(self.num * 2)
         for k, v in self.maps.iteritems():
             new_maps.add(k, v)
         
         self.maps = new_maps
 
+    def migrate(self, count=None):
+        """Moves the items of the next (count) LinearMaps of the old
+        map into the new one; the default count is self.step.
+
+        The items are rehashed here rather than through BetterMap.add,
+        and each old LinearMap is reused for the first new one its
+        items need, so moving a LinearMap usually allocates nothing.
+        Old LinearMaps are dropped as they are moved, so that freeing
+        the old map at the end is cheap too."""
+        old_maps = self.old.maps
+        i = self.cursor
+        stop = i + (count or self.step)
+        n = len(old_maps)
+        if stop > n:
+            stop = n
+        maps = self.maps.maps
+        size = len(maps)
+        while i < stop:
+            m = old_maps[i]
+            i += 1
+            if m is None:
+                continue
+            old_maps[i - 1] = None
+            items = m.items
+            m.items = []
+            for item in items:
+                j = hash(item[0]) % size
+                target = maps[j]
+                if target is None:
+                    if m is not None:
+                        target, m = m, None
+                    else:
+                        target = LinearMap()
+                    maps[j] = target
+                target.items.append(item)
+        self.cursor = stop
+        if stop == n:
+            self.old = None
+
+
+class OpenHashMap(object):
+    """A hashtable that uses open addressing with Robin Hood linear
+    probing instead of a list of LinearMaps.
+
+    The items are stored in three preallocated parallel lists (hashes,
+    keys, values); an empty slot has hash None.  An item lives at the
+    first free slot at or after its home slot (hash & mask).  When an
+    item being inserted has probed further than the item in a slot, it
+    takes the slot and the displaced item continues; this keeps the
+    probe lengths short and even, and lets get stop early.
+
+    max_load: the largest fraction of slots in use before the
+    table grows; growth: the factor by which it grows.
+    """
+
+    def __init__(self, capacity=8, max_load=0.75, growth=2):
+        if not 0 < max_load < 1:
+            raise ValueError, 'max_load must be between 0 and 1.'
+        if growth < 2:
+            raise ValueError, 'growth must be at least 2.'
+        self.max_load = max_load
+        self.growth = growth
+        self.num = 0
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        """Makes empty lists with room for at least capacity slots
+        (rounded up to a power of two)."""
+        size = 1
+        while size < capacity:
+            size *= 2
+        self.mask = size - 1
+        self.limit = int(size * self.max_load)
+        self.hashes = [None] * size
+        self.keys = [None] * size
+        self.values = [None] * size
+
+    def __len__(self):
+        return self.num
+
+    def __contains__(self, k):
+        return self.find(k) is not None
+
+    def __iter__(self):
+        for h, k in zip(self.hashes, self.keys):
+            if h is not None:
+                yield k
+
+    def iteritems(self):
+        for h, k, v in zip(self.hashes, self.keys, self.values):
+            if h is not None:
+                yield k, v
+
+    def find(self, k):
+        """Returns the index of the slot that holds key (k), or None."""
+        h = hash(k)
+        mask = self.mask
+        hashes = self.hashes
+        i = h & mask
+        dist = 0
+        while True:
+            sh = hashes[i]
+            if sh is None or (i - sh) & mask < dist:
+                return None
+            if sh == h and self.keys[i] == k:
+                return i
+            i = (i + 1) & mask
+            dist += 1
+
+    def get(self, k):
+        """Looks up the key (k) and returns the corresponding value,
+        or raises KeyError if the key is not found."""
+        i = self.find(k)
+        if i is None:
+            raise KeyError(k)
+        return self.values[i]
+
+    def add(self, k, v):
+        """Adds a new item that maps from key (k) to value (v), or
+        replaces the value if (k) is already in the map."""
+        if self.num >= self.limit:
+            self.resize(len(self.hashes) * self.growth)
+        if self.insert(hash(k), k, v):
+            self.num += 1
+
+    def insert(self, h, k, v):
+        """Puts an item into the table, which must have a free slot.
+        Returns True if it is a new key."""
+        mask = self.mask
+        hashes, keys, values = self.hashes, self.keys, self.values
+        i = h & mask
+        dist = 0
+        while True:
+            sh = hashes[i]
+            if sh is None:
+                hashes[i], keys[i], values[i] = h, k, v
+                return True
+            if sh == h and keys[i] == k:
+                values[i] = v
+                return False
+            sdist = (i - sh) & mask
+            if sdist < dist:
+                # Robin Hood: the richer item gives up its slot
+                hashes[i], h = h, sh
+                keys[i], k = k, keys[i]
+                values[i], v = v, values[i]
+                dist = sdist
+            i = (i + 1) & mask
+            dist += 1
+
+    def remove(self, k):
+        """Removes the item with key (k), or raises KeyError.
+
+        Uses backward-shift deletion: the items after the removed
+        one move back a slot until one is in its home slot, so no
+        tombstones are needed."""
+        i = self.find(k)
+        if i is None:
+            raise KeyError(k)
+        mask = self.mask
+        hashes, keys, values = self.hashes, self.keys, self.values
+        j = (i + 1) & mask
+        while hashes[j] is not None and (j - hashes[j]) & mask != 0:
+            hashes[i], keys[i], values[i] = hashes[j], keys[j], values[j]
+            i, j = j, (j + 1) & mask
+        hashes[i] = keys[i] = values[i] = None
+        self.num -= 1
+
+    def resize(self, capacity):
+        """Makes new lists with (capacity) slots and reinserts the
+        items."""
+        items = zip(self.hashes, self.keys, self.values)
+        self.allocate(capacity)
+        insert = self.insert
+        for h, k, v in items:
+            if h is not None:
+                insert(h, k, v)
+
+
+class DictMap(dict):
+    """The built-in dict with the add/get interface of the other
+    maps, as a baseline for the benchmarks."""
+    add = dict.__setitem__
+    get = dict.__getitem__
+
+
+# marks a get_many call without a default, since None is a valid one
+NO_DEFAULT = object()
+
+
+class SortedArrayMap(object):
+    """Implementation of a map interface using two parallel NumPy
+    arrays, the keys in sorted order and their values.
+
+    Looking up one key is a binary search, and get_many looks up a
+    whole array of keys with one call to numpy.searchsorted, which is
+    much faster than a Python loop.  Adding one key shifts the arrays,
+    so it takes O(n); to add many keys, use update, which sorts them
+    and merges them in O(n + m log m).  This suits maps that are built
+    once and then read many times.
+
+    The keys (and values) should all have the same type, since they
+    are stored in arrays.
+    """
+
+    def __init__(self, keys=(), values=()):
+        """Builds a map from sequences of keys and values, which
+        need not be sorted.  If a key appears more than once, the
+        last value wins."""
+        self.keys, self.values = self.prepare(keys, values)
+
+    @staticmethod
+    def prepare(keys, values):
+        """Returns arrays of keys and values, sorted by key, with
+        only the last value for repeated keys."""
+        keys = np.asarray(keys)
+        values = np.asarray(values)
+        if len(keys) != len(values):
+            raise ValueError('keys and values have different lengths')
+
+        # a stable sort keeps repeated keys in their original order
+        order = np.argsort(keys, kind='mergesort')
+        keys = keys[order]
+        values = values[order]
+        if len(keys):
+            last = np.ones(len(keys), dtype=bool)
+            last[:-1] = keys[1:] != keys[:-1]
+            keys = keys[last]
+            values = values[last]
+        return keys, values
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, k):
+        return self.index(k) is not None
+
+    def __iter__(self):
+        return iter(self.keys.tolist())
+
+    def iteritems(self):
+        return iter(zip(self.keys.tolist(), self.values.tolist()))
+
+    def index(self, k):
+        """Returns the index of key (k) in the arrays, or None."""
+        if not len(self.keys):
+            return None
+        i = np.searchsorted(self.keys, k)
+        if i < len(self.keys) and self.keys[i] == k:
+            return i
+        return None
+
+    def get(self, k):
+        """Looks up the key (k) and returns the corresponding value,
+        or raises KeyError if the key is not found."""
+        i = self.index(k)
+        if i is None:
+            raise KeyError(k)
+        return self.values[i]
+
+    def find_many(self, ks):
+        """Returns (indices, found) for an array of keys: the position
+        of each key in the arrays, and a boolean array that is True for
+        the keys that are in the map."""
+        ks = np.asarray(ks)
+        found = np.zeros(len(ks), dtype=bool)
+        if not len(self.keys):
+            return np.zeros(len(ks), dtype=np.int64), found
+        if len(ks) > 1000:
+            # searchsorted is about twice as fast with sorted queries,
+            # since each search starts from the previous result
+            order = np.argsort(ks)
+            i = np.empty(len(ks), dtype=np.int64)
+            i[order] = np.searchsorted(self.keys, ks[order])
+        else:
+            i = np.searchsorted(self.keys, ks)
+        inside = i < len(self.keys)
+        found[inside] = self.keys[i[inside]] == ks[inside]
+        return i, found
+
+    def contains_many(self, ks):
+        """Returns a boolean array: which of the keys (ks) are in
+        the map."""
+        return self.find_many(ks)[1]
+
+    def get_many(self, ks, default=NO_DEFAULT):
+        """Looks up an array of keys and returns an array of values.
+
+        If any key is not found, raises KeyError, unless (default) is
+        given, in which case it is used for the missing keys; it may
+        be None.
+        """
+        i, found = self.find_many(ks)
+        if found.all():
+            return self.values[i]
+        if default is NO_DEFAULT:
+            missing = np.asarray(ks)[~found]
+            raise KeyError(missing[0])
+        res = np.empty(len(i), dtype=np.result_type(self.values,
+                                                    np.asarray(default)))
+        res[found] = self.values[i[found]]
+        res[~found] = default
+        return res
+
+    def add(self, k, v):
+        """Adds a new item that maps from key (k) to value (v), or
+        replaces the value if (k) is already in the map."""
+        if not len(self.keys):
+            self.keys, self.values = np.array([k]), np.array([v])
+            return
+        i = np.searchsorted(self.keys, k)
+        if i < len(self.keys) and self.keys[i] == k:
+            self.promote(v)
+            self.values[i] = v
+            return
+        # concatenate chooses a dtype that can hold the new item
+        self.keys = np.concatenate((self.keys[:i], [k], self.keys[i:]))
+        self.values = np.concatenate((self.values[:i], [v],
+                                      self.values[i:]))
+
+    def update(self, keys, values):
+        """Adds many items at once: replaces the values of keys that
+        are already in the map and merges in the others."""
+        keys, values = self.prepare(keys, values)
+        if not len(self.keys):
+            self.keys, self.values = keys, values
+            return
+        i, found = self.find_many(keys)
+        if found.any():
+            self.promote(values)
+            self.values[i[found]] = values[found]
+        new = ~found
+        if not new.any():
+            return
+        self.keys, self.values = merge(self.keys, self.values,
+                                       keys[new], values[new], i[new])
+
+    def promote(self, values):
+        """Changes the dtype of the values, if necessary, so that it
+        can hold (values) too, as concatenate and merge do when new
+        keys are added; otherwise assigning a longer string would
+        truncate it, and a float would be rounded to an int."""
+        dtype = np.result_type(self.values, np.asarray(values))
+        if dtype != self.values.dtype:
+            self.values = self.values.astype(dtype)
+
+    def remove(self, k):
+        """Removes the item with key (k), or raises KeyError."""
+        i = self.index(k)
+        if i is None:
+            raise KeyError(k)
+        self.keys = np.delete(self.keys, i)
+        self.values = np.delete(self.values, i)
+
+
+def merge(keys, values, new_keys, new_values, at):
+    """Merges sorted new_keys into sorted keys, which have no keys in
+    common; at is where each new key goes in keys (from searchsorted).
+
+    Returns the merged arrays of keys and values.
+    """
+    n = len(keys) + len(new_keys)
+    # each new key lands after the old keys before it and the new
+    # keys before it
+    new_pos = at + np.arange(len(new_keys))
+    old = np.ones(n, dtype=bool)
+    old[new_pos] = False
+
+    res_keys = np.empty(n, dtype=np.result_type(keys, new_keys))
+    res_keys[old] = keys
+    res_keys[new_pos] = new_keys
+    res_values = np.empty(n, dtype=np.result_type(values, new_values))
+    res_values[old] = values
+    res_values[new_pos] = new_values
+    return res_keys, res_values
+
+
+class TreeNode(object):
+    """A node in a TreeMap: a key-value pair, two children, and the
+    color of the link from its parent."""
+    __slots__ = ['key', 'value', 'left', 'right', 'red']
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+        self.left = None
+        self.right = None
+        self.red = True
+
+
+def is_red(h):
+    return h is not None and h.red
+
+
+def rotate_left(h):
+    """Turns a right-leaning red link of h to lean left."""
+    x = h.right
+    h.right = x.left
+    x.left = h
+    x.red = h.red
+    h.red = True
+    return x
+
+
+def rotate_right(h):
+    """Turns a left-leaning red link of h to lean right."""
+    x = h.left
+    h.left = x.right
+    x.right = h
+    x.red = h.red
+    h.red = True
+    return x
+
+
+def flip_colors(h):
+    """Flips the colors of h and its two children."""
+    h.red = not h.red
+    h.left.red = not h.left.red
+    h.right.red = not h.right.red
+
+
+def move_red_left(h):
+    """Makes h.left or one of its children red, assuming h is red
+    and h.left and h.left.left are black."""
+    flip_colors(h)
+    if is_red(h.right.left):
+        h.right = rotate_right(h.right)
+        h = rotate_left(h)
+        flip_colors(h)
+    return h
+
+
+def move_red_right(h):
+    """Makes h.right or one of its children red, assuming h is red
+    and h.right and h.right.left are black."""
+    flip_colors(h)
+    if is_red(h.left.left):
+        h = rotate_right(h)
+        flip_colors(h)
+    return h
+
+
+def balance(h):
+    """Restores the left-leaning red-black invariants at h."""
+    if is_red(h.right) and not is_red(h.left):
+        h = rotate_left(h)
+    if is_red(h.left) and is_red(h.left.left):
+        h = rotate_right(h)
+    if is_red(h.left) and is_red(h.right):
+        flip_colors(h)
+    return h
+
 
 class TreeMap(object):
-    """Implementation of a map interface using a red-black tree."""
+    """Implementation of a map interface using a red-black tree.
+
+    This is a left-leaning red-black tree (Sedgewick, 2008), so add,
+    get and remove take O(log n) time, and the keys are kept in order:
+    iteration is in increasing order of key, floor and ceiling find
+    the nearest keys, and range(lo, hi) yields the k items between lo
+    and hi in O(log n + k).
+    """
+
     def __init__(self):
-        pass
+        self.root = None
+        self.num = 0
 
-etime = listsum.etime
+    def __len__(self):
+        return self.num
 
-def test_add(o, n):
-    """Test the method add for map object o, with n key value pairs."""
-    
-    start = etime()
-    for i in range(n):
-        o.add(str(i), i+1)
-    end = etime()
-    return end - start
+    def __contains__(self, k):
+        return self.find(k) is not None
+
+    def __iter__(self):
+        for k, v in self.iteritems():
+            yield k
+
+    def iteritems(self):
+        """Generates the items in increasing order of key."""
+        stack = []
+        h = self.root
+        while stack or h is not None:
+            if h is not None:
+                stack.append(h)
+                h = h.left
+            else:
+                h = stack.pop()
+                yield h.key, h.value
+                h = h.right
+
+    def find(self, k):
+        """Returns the node with key (k), or None."""
+        h = self.root
+        while h is not None:
+            if k < h.key:
+                h = h.left
+            elif k == h.key:
+                return h
+            else:
+                h = h.right
+        return None
+
+    def get(self, k):
+        """Looks up the key (k) and returns the corresponding value,
+        or raises KeyError if the key is not found."""
+        h = self.find(k)
+        if h is None:
+            raise KeyError(k)
+        return h.value
+
+    def add(self, k, v):
+        """Adds a new item that maps from key (k) to value (v), or
+        replaces the value if (k) is already in the map."""
+        self.root = self._add(self.root, k, v)
+        self.root.red = False
+
+    def _add(self, h, k, v):
+        if h is None:
+            self.num += 1
+            return TreeNode(k, v)
+
+        if k < h.key:
+            h.left = self._add(h.left, k, v)
+        elif k == h.key:
+            h.value = v
+        else:
+            h.right = self._add(h.right, k, v)
+        return balance(h)
 
-def test_get(o, n):
-    """Test the method get for map object o with n key value pairs."""
+    def remove(self, k):
+        """Removes the item with key (k), or raises KeyError."""
+        if k not in self:
+            raise KeyError(k)
+        if not is_red(self.root.left) and not is_red(self.root.right):
+            self.root.red = True
+        self.root = self._remove(self.root, k)
+        if self.root is not None:
+            self.root.red = False
+        self.num -= 1
+
+    def _remove(self, h, k):
+        if k < h.key:
+            if not is_red(h.left) and not is_red(h.left.left):
+                h = move_red_left(h)
+            h.left = self._remove(h.left, k)
+        else:
+            if is_red(h.left):
+                h = rotate_right(h)
+            if k == h.key and h.right is None:
+                return None
+            if not is_red(h.right) and not is_red(h.right.left):
+                h = move_red_right(h)
+            if k == h.key:
+                # replace h with its successor
+                x = h.right
+                while x.left is not None:
+                    x = x.left
+                h.key, h.value = x.key, x.value
+                h.right = self._remove_min(h.right)
+            else:
+                h.right = self._remove(h.right, k)
+        return balance(h)
+
+    def _remove_min(self, h):
+        if h.left is None:
+            return None
+        if not is_red(h.left) and not is_red(h.left.left):
+            h = move_red_left(h)
+        h.left = self._remove_min(h.left)
+        return balance(h)
+
+    def floor(self, k):
+        """Returns the largest key less than or equal to (k),
+        or raises KeyError if there is none."""
+        best = None
+        h = self.root
+        while h is not None:
+            if k < h.key:
+                h = h.left
+            elif k == h.key:
+                return h.key
+            else:
+                best = h
+                h = h.right
+        if best is None:
+            raise KeyError(k)
+        return best.key
+
+    def ceiling(self, k):
+        """Returns the smallest key greater than or equal to (k),
+        or raises KeyError if there is none."""
+        best = None
+        h = self.root
+        while h is not None:
+            if k < h.key:
+                best = h
+                h = h.left
+            elif k == h.key:
+                return h.key
+            else:
+                h = h.right
+        if best is None:
+            raise KeyError(k)
+        return best.key
+
+    def range(self, lo, hi):
+        """Generates the items with lo <= key <= hi in increasing
+        order of key.  Subtrees entirely outside the range are not
+        visited, so this takes O(log n + k) for k items."""
+        stack = []
+        h = self.root
+        while stack or h is not None:
+            if h is not None:
+                stack.append(h)
+                # the left subtree only has keys < h.key
+                h = h.left if lo < h.key else None
+            else:
+                h = stack.pop()
+                if h.key > hi:
+                    return
+                if lo <= h.key:
+                    yield h.key, h.value
+                h = h.right
+
+def add_all(o, keys):
+    """Adds the given keys to map object o."""
+    for i, k in enumerate(keys):
+        o.add(k, i+1)
+
+def test_add(cls, n, repeat=3):
+    """Test the method add for a new map of class cls, with n key
+    value pairs.
+
+    Returns the median time to add all n pairs to an empty map."""
+    keys = [str(i) for i in range(n)]
+    timing = measure(add_all, setup=lambda: (cls(), keys), repeat=repeat)
+    return timing.median()
+
+def test_get(cls, n, repeat=3):
+    """Test the method get for a map of class cls with n key value
+    pairs.
+
+    Returns the median time per lookup, for keys chosen at random.
+    Fast lookups are repeated until there are enough to time.  The
+    time of the same loop without the lookup, which is about as long
+    as a fast lookup, is subtracted."""
+    o = cls()
     for i in range(n):
         o.add(i, i+1)
-    # look_up = random.choice(range(n))
-    look_up = n - 1
+    keys = random.Random(17).sample(xrange(n), min(n, 1000))
 
-    start = etime()
-    v = o.get(look_up)
-    end = etime()
-    return end - start
+    get = o.get
+    next_key = cycle(keys).next
+    timing = measure(lambda: get(next_key()), repeat=repeat)
+    baseline = measure(lambda: next_key(), repeat=repeat)
+    return max(timing.median() - baseline.median(), 0.0)
 
 def test_loop_add(name):
     """Tests the method add with a range of values for n
@@ -169,7 +848,10 @@ def test_loop_add(name):
     # depending on the object
     d = dict(HashMap=10000,
              BetterMap=10000000,
-             LinearMap=100000)
+             LinearMap=100000,
+             OpenHashMap=10000,
+             DictMap=100000,
+             TreeMap=10000)
     factor = d[name]
     
     # test add for object o ver a range of 
@@ -178,8 +860,7 @@ def test_loop_add(name):
     ts = []
     for i in range(2, 25):
         n = factor * i
-        o = eval(name + '()')
-        t = test_add(o, n)
+        t = test_add(eval(name), n)
         print n, t
         ns.append(n)
         ts.append(t)
@@ -193,7 +874,10 @@ def test_loop_get(name):
     Returns a list of ns and run times."""
     d = dict(HashMap=100000,
              BetterMap=100000,
-             LinearMap=100000)
+             LinearMap=100000,
+             OpenHashMap=100000,
+             DictMap=100000,
+             TreeMap=100000)
     factor = d[name]
     
     # test add for object o ver a range of 
@@ -202,8 +886,7 @@ def test_loop_get(name):
     ts = []
     for i in range(2, 25):
         n = factor * i
-        o = eval(name + '()')
-        t = test_get(o, n)
+        t = test_get(eval(name), n)
         print n, t
         ns.append(n)
         ts.append(t)
@@ -215,7 +898,7 @@ plot = listsum.plot
 fit = listsum.fit
 save = listsum.save
 
-def make_fig(obs, f, scale='log', exp=1.0, filename=''):
+def make_fig(obs, f, scale='log', exp=None, filename=''):
     pyplot.clf()
     pyplot.xscale(scale)
     pyplot.yscale(scale)
@@ -223,7 +906,7 @@ def make_fig(obs, f, scale='log', exp=1.0, filename=''):
     pyplot.xlabel('n')
     pyplot.ylabel('run time (s)')
 
-    colors = ['blue', 'orange', 'green']
+    colors = ['blue', 'orange', 'green', 'red', 'purple']
     for o, color in zip(obs, colors):
         if f == 'add':
             data = test_loop_add(o)
@@ -238,6 +921,141 @@ def make_fig(obs, f, scale='log', exp=1.0, filename=''):
     else:
         pyplot.show()
 
+def collect(obs, f, filename, exp=None):
+    """Runs test_loop_add or test_loop_get (f is 'add' or 'get') for
+    the given map classes and writes the results to filename, to be
+    drawn later by BenchPlot.render_all."""
+    test_loop = test_loop_add if f == 'add' else test_loop_get
+    series = [(o,) + test_loop(o) for o in obs]
+    BenchPlot.save_results(filename, series, title='Compare method ' + f,
+                           exp=exp)
+
+def test_compare(names, n=100000):
+    """Adds n items to each kind of map, then looks each of them up,
+    and prints the time per operation in microseconds."""
+    print '%-12s %10s %10s' % ('map', 'add (us)', 'get (us)')
+    for name in names:
+        o = eval(name + '()')
+        start = default_timer()
+        for i in xrange(n):
+            o.add(i, i)
+        middle = default_timer()
+        for i in xrange(n):
+            o.get(i)
+        end = default_timer()
+        print '%-12s %10.3f %10.3f' % (name, 1e6 * (middle - start) / n,
+                                       1e6 * (end - middle) / n)
+
+
+class LatencyHistogram(object):
+    """Counts operation latencies in buckets that grow by a factor
+    of two, starting at (base) seconds, so a histogram of millions of
+    operations takes a few dozen counters.  Percentiles are reported
+    as the upper bound of the bucket they fall in."""
+
+    def __init__(self, base=1e-7):
+        self.base = base
+        self.counts = {}
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, t):
+        """Adds one latency of (t) seconds."""
+        i = 0
+        bound = self.base
+        while t > bound:
+            bound *= 2
+            i += 1
+        self.counts[i] = self.counts.get(i, 0) + 1
+        self.n += 1
+        self.total += t
+        if t > self.max:
+            self.max = t
+
+    def bound(self, i):
+        """Upper bound of bucket i, in seconds."""
+        return self.base * 2**i
+
+    def percentile(self, q):
+        """Returns the latency below which (q) percent of the
+        operations fall, rounded up to a bucket bound."""
+        target = self.n * q / 100.0
+        seen = 0
+        for i in sorted(self.counts):
+            seen += self.counts[i]
+            if seen >= target:
+                return min(self.bound(i), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.n if self.n else 0.0
+
+    def __str__(self):
+        lines = []
+        for i in sorted(self.counts):
+            lines.append('<= %10.1f us: %d' % (1e6 * self.bound(i),
+                                                self.counts[i]))
+        return '\n'.join(lines)
+
+
+def test_latency(o, n):
+    """Adds n items to map object o, timing each add, and returns
+    a LatencyHistogram.
+
+    The garbage collector is off while timing; otherwise its pauses
+    (up to a second with millions of objects) swamp the resizes."""
+    hist = LatencyHistogram()
+    timer = default_timer
+    record = hist.record
+    gc.disable()
+    try:
+        for i in xrange(n):
+            start = timer()
+            o.add(i, i)
+            record(timer() - start)
+    finally:
+        gc.enable()
+    return hist
+
+
+def compare_resize(n=1000000):
+    """Prints the latency percentiles of add for HashMap with the
+    all-at-once and the incremental resize."""
+    print '%-12s %8s %8s %8s %8s %10s' % (
+        'resize', 'mean', 'p50', 'p99', 'p99.9', 'max (us)')
+    for label, o in [('all at once', HashMap()),
+                     ('incremental', HashMap(incremental=True))]:
+        hist = test_latency(o, n)
+        print '%-12s %8.2f %8.2f %8.2f %8.2f %10.1f' % (
+            label, 1e6 * hist.mean(), 1e6 * hist.percentile(50),
+            1e6 * hist.percentile(99), 1e6 * hist.percentile(99.9),
+            1e6 * hist.max)
+
+
+def compare_batch(n=1000000, k=1000000):
+    """Builds maps with n integer keys and prints the rate of k
+    lookups for dict, looking up one key at a time, and for
+    SortedArrayMap, looking them up with get_many."""
+    random_state = np.random.RandomState(17)
+    keys = random_state.permutation(n)
+    queries = random_state.randint(0, n, k)
+
+    d = dict(zip(keys.tolist(), keys.tolist()))
+    qs = queries.tolist()
+    start = default_timer()
+    for q in qs:
+        d[q]
+    elapsed = default_timer() - start
+    print '%-16s %12.0f lookups/s' % ('dict', k / elapsed)
+
+    m = SortedArrayMap(keys, keys)
+    start = default_timer()
+    m.get_many(queries)
+    elapsed = default_timer() - start
+    print '%-16s %12.0f lookups/s' % ('SortedArrayMap', k / elapsed)
+
+
 # def main(script):
 #     m = HashMap()
 #     s = string.ascii_lowercase
@@ -249,8 +1067,19 @@ def make_fig(obs, f, scale='log', exp=1.0, filename=''):
 #         print k, m.get(k)
 
 def main(script):
+    # replacing values must not truncate them to the old dtype
+    m = SortedArrayMap(['a', 'b'], ['x', 'y'])
+    m.add('a', 'longer')
+    m.update(['b'], ['muchlonger'])
+    assert m.get('a') == 'longer' and m.get('b') == 'muchlonger'
+    m = SortedArrayMap([1, 2], [10, 20])
+    m.add(1, 2.5)
+    assert m.get(1) == 2.5
+    assert m.get_many([1, 3], default=None).tolist() == [2.5, None]
+
     make_fig(['LinearMap', 'BetterMap'], 'get', exp=1.0)
     make_fig(['HashMap'], 'get', exp=0.0)
+    make_fig(['HashMap', 'TreeMap', 'LinearMap'], 'add', exp=1.0)
 
 
 if __name__ == '__main__':
@@ -1,23 +1,50 @@
-from Graph import Edge, Vertex, Graph
-import random
+from Graph import Graph, gnp_pairs
+import math
 import string
+import numpy as np
+from RandomStreams import numpy_rng
 
 class RandomGraph(Graph):
     def __init__(self, vs=[], es=[]):
         Graph.__init__(self, vs, es)
 
-    def add_random_edges(self, p):
-        """Erdos-Renyi G(n, p) model.
-        n is given by number of vertices in the graph.
-        Pass p to add edges randomly until there is 
-        a probability of p that there is an edge between
-        any two graphs."""
-        vs = self.vertices()
-        while vs:
-            v = vs.pop()
-            for w in vs:
-                if random.random() <= p:
-                    self.add_edge(Edge(v, w))
+
+def gnp_edge_array(n, p, random_state=None):
+    """Returns the edges of a G(n, p) random graph as an (m, 2)
+    array of vertex indices, with rows (i, j) and j < i.
+
+    This is the vectorized form of gnp_pairs: the gaps between edges
+    are drawn in batches with NumPy, and their running sum gives the
+    position of each edge in the list of all n(n-1)/2 pairs.
+
+    random_state: numpy.random.RandomState, int seed or None.
+    """
+    random_state = numpy_rng(random_state)
+
+    total = n * (n - 1) // 2
+    if p <= 0 or total == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+    if p >= 1:
+        ks = np.arange(total, dtype=np.int64)
+    else:
+        batch = int(total * p + 5 * math.sqrt(total * p)) + 16
+        chunks = []
+        last = -1
+        while last < total:
+            gaps = random_state.geometric(p, size=batch)
+            ks = last + np.cumsum(gaps)
+            chunks.append(ks)
+            last = ks[-1]
+        ks = np.concatenate(chunks)
+        ks = ks[ks < total]
+
+    # invert k = i*(i-1)/2 + j to get the pair (i, j)
+    i = ((1 + np.sqrt(1 + 8.0 * ks)) / 2).astype(np.int64)
+    i[i * (i - 1) // 2 > ks] -= 1
+    i[(i + 1) * i // 2 <= ks] += 1
+    j = ks - i * (i - 1) // 2
+    return np.column_stack([i, j])
+
 
 def alphabet_cycle():
     while True:
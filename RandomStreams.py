@@ -0,0 +1,81 @@
+""" Code example from Complexity and Computation, a book about
+exploring complexity science with Python.  Available free from
+
+http://greenteapress.com/complexity
+
+Copyright 2011 Allen B. Downey.
+Distributed under the GNU General Public License at gnu.org/licenses/gpl.html.
+
+Random number streams for the generators and randomized algorithms.
+
+Every function that uses random numbers takes an optional argument
+that can be None, an integer seed, or a generator object:
+
+    rng           random.Random, or anything with the same methods,
+                  for code that draws one number at a time;
+    random_state  numpy.random.RandomState, for code that draws
+                  arrays of numbers.
+
+None means the shared global generator (the random module, or
+NumPy's global RandomState), as before.  An integer seed makes a new
+generator, so results are reproducible.
+
+For parallel work, spawn derives independent seeds from one seed and
+a key, such as the index of a task.  Because the seed of each task
+depends only on the key, not on which worker runs it or in what
+order, the results are the same for any number of workers.
+"""
+import hashlib
+import random
+
+import numpy as np
+
+
+def derive_seed(seed, *key):
+    """Returns a 32-bit seed derived from seed and key.
+
+    Different keys give unrelated seeds; the same seed and key always
+    give the same result, in any process.
+    """
+    s = repr((seed,) + key)
+    return int(hashlib.md5(s).hexdigest()[:8], 16)
+
+
+def spawn(seed, count):
+    """Returns a list of count independent seeds derived from seed."""
+    return [derive_seed(seed, i) for i in range(count)]
+
+
+def python_rng(rng=None):
+    """Returns a random.Random-like generator.
+
+    rng: None for the random module, an int seed for a new
+    random.Random, or a generator, which is returned unchanged.
+    """
+    if rng is None:
+        return random
+    if isinstance(rng, (int, long)):
+        return random.Random(rng)
+    return rng
+
+
+def numpy_rng(random_state=None):
+    """Returns a numpy.random.RandomState.
+
+    random_state: None for NumPy's global RandomState, an int seed for
+    a new RandomState, or a RandomState, which is returned unchanged.
+    """
+    if isinstance(random_state, np.random.RandomState):
+        return random_state
+    if random_state is None:
+        return np.random.mtrand._rand
+    return np.random.RandomState(random_state)
+
+
+def spawn_rngs(seed, count, kind='python'):
+    """Returns count independent generators derived from seed.
+
+    kind: 'python' for random.Random, 'numpy' for RandomState.
+    """
+    make = random.Random if kind == 'python' else np.random.RandomState
+    return [make(s) for s in spawn(seed, count)]
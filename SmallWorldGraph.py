@@ -1,10 +1,12 @@
 from RandomGraph import RandomGraph
 import numpy as np
 from Graph import Vertex
-from Graph import Edge
-from Graph import Graph
+from Graph import Graph, is_odd
+from ArrayGraph import ArrayGraph
+import GraphMetrics
+from RandomStreams import numpy_rng
 import GraphWorld
-import random
+import matplotlib.pyplot as pyplot
 from collections import deque
 
 class SmallWorldGraph(RandomGraph):
@@ -15,112 +17,177 @@ class SmallWorldGraph(RandomGraph):
         self.k = k
         self.add_regular_edges(k)
 
-    def rewire(self, p):
-        """A method that takes a probability
-        p as a parameter and, starting with a 
-        regular graph, rewires the graph using 
-        Watts and Strogatzs algorithm"""
-        original_edges = set(edge for sublist in self.edges() for edge in sublist)
-        subset_to_rewire = list()
-        for closeness in range(self.k):
-            for v in self.vertices():
-                if len(original_edges) < 1:
-                    break
-                # choose neighbour by degree of separation
-                # use sort to make sure that list of 
-                # vertices is ordered. Not sure if this
-                # is neccessary.
-                w = sorted(self.out_vertices(v))[closeness]
-                e = self.get_edge(v, w)
-                if e in original_edges:
-                    original_edges.remove(e)
-                    replace = random.random() <= p
-                    if replace:
-                        subset_to_rewire.append(e)
-        self.replace(subset_to_rewire)
-
-    def replace(self, subset):
-        """Takes a subset of Edges and replaces them randomly."""
-        for e in subset:
-            v = e[0]
-            self.remove_edge(e)
-            choices = list(set(self.vertices()) - set([v]))
-            new = random.choice(choices)
-            self.add_edge(Edge(v, new))
-    
     def clustering_coefficient(self):
         """Average Cluster ratio of all vertices.
         Cluster ratio per vertex is actual number
         of neighbours connectivity divided by maximum possible number
-        of neighbours connectivity"""
-        res = [] # list for storing ratios for each vertex
-        edges = set(edge for sublist in self.edges() for edge in sublist)
-        for v in self.vertices(): # iterate through all vertices
-            out = self.out_vertices(v) # store the out vertices
-            k_v = len(out) # len of out vertices is number of neighbours 
-            # compute the maximum number of neighbour connectedness:
-            most = float(k_v) * (k_v - 1.0) / 2.0 
-            actual = 0 # initiate count of actual neighbour connectedness
-            # iterate through all possible combinations of vs neighbours:
-            for w in out:
-                for x in out: 
-                    # If the Edge between the neighbour pair exists,
-                    # incresae the actual count by 1:
-                    if Edge(w, x) in edges or Edge(x, w) in edges:
-                        actual += 1
-            # calculate vs ratio as actual divided by most:
-            ratio = float(actual) / most
-            res.append(ratio) # append to list of ratios
-        return np.average(res) # use numpy to compute the mean ratio
+        of neighbours connectivity; it is 0 for vertices with fewer
+        than two neighbours.
+
+        Triangles are counted on the CSR arrays of an ArrayGraph;
+        see GraphMetrics.clustering_coefficient, which also returns
+        the ratio of each vertex."""
+        local, average = GraphMetrics.clustering_coefficient(
+            ArrayGraph.from_graph(self))
+        return average
 
     def shortest_paths(self, initial):
         """Simplified version of Dijkstras shortest path algorithm.
         Takes an initial node and calculates its distance to all
-        other nodes. Assumes distance of 1 for all edges."""
-        distances = dict()
+        other nodes. Assumes distance of 1 for all edges, so a
+        breadth-first search finds them in order.
+
+        Vertices that cannot be reached map to None."""
+        distances = dict.fromkeys(self.vertices())
         distances[initial] = 0
-        others = self.vertices()
-        others.remove(initial)
-        [distances[each] = None for each in others]
         q = deque()
         q.append(initial)
         while q:
-            v = q.pop()
-            d = distances[v]
-            out = self.out_vertices(v)
-            for w in out:
-                if distances[w] == None:
-                    distances[w] = d + 1.0
-            q.extend(out)
+            v = q.popleft()
+            d = distances[v] + 1
+            for w in self.out_vertices(v):
+                if distances[w] is None:
+                    distances[w] = d
+                    q.append(w)
         return distances
 
-    def shortest_path_coeff(self):
+    def shortest_path_coeff(self, k=None, processes=1, random_state=None):
         """Calculate the shortes path coefficient. It is the average
-        of all shortest paths between all vertix pairs."""
-        # get all vertix combinations:
-        res = deque()
-        vs = self.vertices()
-        for v in vs:
-            sps = self.shortest_paths(v)
-            for w in vs:
-                if v != w:
-                    res.append(sps[w])
-        return np.average(res)
-
-        # for all combinations, get the shortest paths
-        # store the shortest paths in a list to calculate their average
-
-
-
-
-
-
-def plot():
-    pass
+        of all shortest paths between all vertix pairs.
+
+        The searches run on the CSR arrays of an ArrayGraph (see
+        GraphMetrics), one per source vertex, split across
+        (processes) worker processes.  If k is given, only k random
+        sources are searched and the result is an estimate; use
+        GraphMetrics.estimate_path_length to get its error bounds."""
+        g = ArrayGraph.from_graph(self)
+        if k is None:
+            return GraphMetrics.mean_path_length(g, processes)
+        est, stderr, ci = GraphMetrics.estimate_path_length(
+            g, k, random_state, processes)
+        return est
+
+
+def ring_lattice_array(n, k):
+    """Returns the edges of a ring lattice as an (n*k/2, 2) array.
+
+    Each vertex i is joined to i+1, ..., i+k/2 (mod n).  Rows are
+    ordered by closeness and then by i, which is the order in which
+    Watts and Strogatz visit the edges when rewiring."""
+    if is_odd(k):
+        raise ValueError, 'k must be even.'
+    if k >= n:
+        raise ValueError, 'k must be less than n.'
+    us = np.tile(np.arange(n, dtype=np.int64), k // 2)
+    ws = (us + np.repeat(np.arange(1, k // 2 + 1), n)) % n
+    return np.column_stack([us, ws])
+
+
+def rewire_array(edges, n, p, random_state=None):
+    """Returns a copy of the (m, 2) edge array in which each edge
+    (u, w), with probability p, has w replaced by a random vertex.
+
+    Replacements that would make a self-loop or repeat an existing
+    edge are rejected and drawn again, so the result is a simple
+    graph with the same number of edges.  Candidates are drawn in
+    batches, and the expected total cost is O(m).
+    """
+    random_state = numpy_rng(random_state)
+    edges = edges.copy()
+    chosen = np.flatnonzero(random_state.random_sample(len(edges)) < p)
+    if len(chosen) == 0:
+        return edges
+
+    lo = np.minimum(edges[:, 0], edges[:, 1])
+    hi = np.maximum(edges[:, 0], edges[:, 1])
+    present = set((lo * n + hi).tolist())
+    degree = np.bincount(edges.ravel(), minlength=n).tolist()
+
+    candidates = []
+    for i in chosen.tolist():
+        u, w = edges[i].tolist()
+        if degree[u] >= n - 1:
+            continue
+        while True:
+            if not candidates:
+                candidates = random_state.randint(
+                    n, size=len(chosen) + 16).tolist()
+            x = candidates.pop()
+            key = min(u, x) * n + max(u, x)
+            if x != u and key not in present:
+                break
+        present.discard(min(u, w) * n + max(u, w))
+        present.add(key)
+        degree[w] -= 1
+        degree[x] += 1
+        edges[i, 1] = x
+    return edges
+
+
+def watts_strogatz_sweep(n, k, ps, random_state=None, sources=None):
+    """Generates (p, C(p)/C(0), L(p)/L(0)) for each p in ps, where C
+    is the clustering coefficient and L the mean path length of a
+    Watts-Strogatz graph rewired with probability p.
+
+    The ring lattice is built once; each p starts from a copy of its
+    edge array.  Results are yielded as they are computed, so they can
+    be plotted while the sweep runs.
+
+    sources: if given, L is estimated from that many random sources
+    (see GraphMetrics.estimate_path_length) instead of all vertices.
+    """
+    random_state = numpy_rng(random_state)
+    lattice = ring_lattice_array(n, k)
+
+    def measure(edges):
+        g = ArrayGraph(n)
+        g.add_edge_array(edges)
+        local, c = GraphMetrics.clustering_coefficient(g)
+        if sources is None:
+            l = GraphMetrics.mean_path_length(g)
+        else:
+            l, stderr, ci = GraphMetrics.estimate_path_length(
+                g, sources, random_state)
+        return c, l
+
+    c0, l0 = measure(lattice)
+    for p in ps:
+        c, l = measure(rewire_array(lattice, n, p, random_state))
+        yield p, c / c0, l / l0
+
+
+def plot(n=1000, k=10, ps=None, filename=''):
+    """Plots the normalized clustering coefficient and path length
+    against p, as in Figure 2 of Watts and Strogatz, redrawing after
+    each point."""
+    if ps is None:
+        ps = np.logspace(-4, 0, 14)
+    pyplot.ion()
+    pyplot.clf()
+    pyplot.xscale('log')
+    pyplot.xlabel('p')
+    pyplot.ylim(0, 1.05)
+    xs, cs, ls = [], [], []
+    for p, c, l in watts_strogatz_sweep(n, k, ps):
+        print p, c, l
+        xs.append(p)
+        cs.append(c)
+        ls.append(l)
+        pyplot.cla()
+        pyplot.xscale('log')
+        pyplot.plot(xs, cs, 'o-', label='C(p) / C(0)')
+        pyplot.plot(xs, ls, 's-', label='L(p) / L(0)')
+        pyplot.legend(loc=3)
+        pyplot.pause(0.001)
+    pyplot.ioff()
+    if filename:
+        pyplot.savefig(filename)
+    else:
+        pyplot.show()
 
 def main():
     g = SmallWorldGraph(1000, 10)
-    g.rewire(0.10)
+    print g.rewire(0.10)
     print g.clustering_coefficient()
     print g.shortest_path_coeff()
 
@@ -0,0 +1,85 @@
+""" Code example from Complexity and Computation, a book about
+exploring complexity science with Python.  Available free from
+
+http://greenteapress.com/complexity
+
+Copyright 2011 Allen B. Downey.
+Distributed under the GNU General Public License at gnu.org/licenses/gpl.html.
+"""
+
+
+class DisjointSet(object):
+    """A DisjointSet partitions the integers 0 .. n-1 into groups.
+
+    Uses union by rank and path compression, so a sequence of m
+    operations takes O(m alpha(n)) time, which is linear in practice.
+    """
+
+    def __init__(self, n=0):
+        """Starts with n singleton groups."""
+        self.parent = range(n)
+        self.rank = [0] * n
+        self.count = n
+
+    def __len__(self):
+        return len(self.parent)
+
+    def add(self):
+        """Adds a new singleton group and returns its element."""
+        x = len(self.parent)
+        self.parent.append(x)
+        self.rank.append(0)
+        self.count += 1
+        return x
+
+    def find(self, x):
+        """Returns the representative of the group containing x."""
+        parent = self.parent
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+
+        # path compression: point everything on the path at the root
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    def union(self, x, y):
+        """Merges the groups containing x and y.
+
+        Returns True if they were different groups, False otherwise."""
+        rx, ry = self.find(x), self.find(y)
+        if rx == ry:
+            return False
+
+        rank = self.rank
+        if rank[rx] < rank[ry]:
+            rx, ry = ry, rx
+        self.parent[ry] = rx
+        if rank[rx] == rank[ry]:
+            rank[rx] += 1
+        self.count -= 1
+        return True
+
+    def connected(self, x, y):
+        """Returns True if x and y are in the same group."""
+        return self.find(x) == self.find(y)
+
+    def is_connected(self):
+        """Returns True if everything is in one group."""
+        return self.count <= 1
+
+
+def main(script, *args):
+    ds = DisjointSet(5)
+    ds.union(0, 1)
+    ds.union(3, 4)
+    print ds.count, ds.connected(0, 1), ds.connected(1, 3)
+    ds.union(1, 4)
+    ds.union(2, 3)
+    print ds.count, ds.is_connected()
+
+
+if __name__ == '__main__':
+    import sys
+    main(*sys.argv)
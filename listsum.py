@@ -11,6 +11,10 @@ License: GNU GPLv3 http://www.gnu.org/licenses/gpl.html
 import os
 import matplotlib.pyplot as pyplot
 
+from Benchmark import measure
+from Complexity import fit, fit_complexity, check_regression
+import BenchPlot
+
 
 def etime():
     """Measures user and system time this process has used.
@@ -41,16 +45,15 @@ def sum_sum(t, init):
     return sum(t, init)
 
 
-def test_func(f, n):
+def test_func(f, n, repeat=3):
     """Tests the function (f) with a list of lists of length (n)
-    and return the elapsed time."""
-    t = [[1]] * n
+    and returns the median elapsed time of (repeat) runs.
 
-    start = etime()
-    f(t, [])
-    end = etime()
-    elapsed = end - start
-    return elapsed
+    Each run gets a new empty list to add to (see Benchmark.measure).
+    """
+    t = [[1]] * n
+    timing = measure(f, setup=lambda: (t, []), repeat=repeat)
+    return timing.median()
 
 
 def test(name):
@@ -81,38 +84,32 @@ def test(name):
     return ns, ts
 
 
-def plot(ns, ts, label, color='blue', exp=1.0):
-    """Plots data and a fitted curve.
+def plot(ns, ts, label, color='blue', exp=None):
+    """Plots data and a fitted curve, and prints the estimated order
+    of growth (see Complexity.fit_complexity).
 
     ns: sequence of n (problem size)
     ts: sequence of t (run time)
     label: string label for the data curve
     color: string color for the data curve
-    exp: exponent (slope) for the fitted curve
+    exp: expected exponent (slope) for the fitted curve; if the data
+         grow clearly faster, a warning is printed.  If None, the
+         curve is the model that fits the data best.
     """
-    tfit = fit(ns, ts, exp)
+    if exp is None:
+        result = fit_complexity(ns, ts)
+        tfit = result.predict(ns)
+        print label, result
+    else:
+        regressed, result = check_regression(ns, ts, exp)
+        tfit = fit(ns, ts, exp)
+        print label, result
+        if regressed:
+            print 'Warning: %s grows faster than n**%g' % (label, exp)
     pyplot.plot(ns, tfit, color='0.7', linewidth=2, linestyle='dashed')
     pyplot.plot(ns, ts, label=label, color=color, linewidth=3)
 
 
-def fit(ns, ts, exp=1.0, index=-1):
-    """Fits a curve with the given exponent.
-
-    Use the given index as a reference point, and scale all other
-    points accordingly.
-    """
-    nref = ns[index]
-    tref = ts[index]
-
-    tfit = []
-    for n in ns:
-        ratio = float(n) / nref
-        t = ratio**exp * tref
-        tfit.append(t)
-
-    return tfit
-
-
 def save(root, exts=['eps', 'pdf']):
     """Saves the current figure in the given formats.
 
@@ -125,7 +122,7 @@ def save(root, exts=['eps', 'pdf']):
         pyplot.savefig(filename)
 
 
-def make_fig(funcs, scale='log', exp=1.0, filename=''):
+def make_fig(funcs, scale='log', exp=None, filename=''):
     pyplot.clf()
     pyplot.xscale(scale)
     pyplot.yscale(scale)
@@ -146,6 +143,13 @@ def make_fig(funcs, scale='log', exp=1.0, filename=''):
         pyplot.show()
 
 
+def collect(funcs, filename, exp=None):
+    """Runs the tests for the given functions and writes the results
+    to filename, to be drawn later by BenchPlot.render_all."""
+    series = [(func,) + test(func) for func in funcs]
+    BenchPlot.save_results(filename, series, exp=exp)
+
+
 def main(script):
     make_fig(['sum_extend', 'sum_plus'], exp=1.0, filename='listsum1')
     make_fig(['sum_sum'], exp=2.0, filename='listsum2')